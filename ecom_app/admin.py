@@ -1,12 +1,72 @@
+from django import forms
 from django.contrib import admin
-from .models import Customer,Categories,Product,Color,Size,ProductImage,ProductOffer,HeroSlider,CategorySlider,ProductVariation,ShipmentAddress,Cart,Payment,Order
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import Customer,Categories,Product,Color,Size,ProductImage,ProductOffer,HeroSlider,CategorySlider,ProductVariation,ShipmentAddress,Cart,Payment,Order,Job
+from .signals import stock_changed
 
 # Register your models here.
 
+def estimated_count(queryset):
+    # Row count from the table statistics, None where the backend keeps none
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 until the table is first analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+# Estimated Count Paginator
+# Unfiltered changelists of big tables take their count from the table statistics,
+# COUNT(*) over millions of rows costs more than the page itself
+class EstimatedCountPaginator(Paginator):
+    exact_count_limit = 100000
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate > self.exact_count_limit:
+                return estimate
+        return super().count
+
+
+# Large Table Admin
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) behind "x of y selected"
+    show_full_result_count = False
+
+
+def order_status_action(order_status):
+    def action(modeladmin, request, queryset):
+        # One UPDATE whatever the selection, also across all pages
+        updated = queryset.transition_status(order_status)
+        modeladmin.message_user(request, f'{updated} orders marked as {order_status}.')
+    action.__name__ = f'mark_{order_status.lower()}'
+    return admin.action(description=f'Mark selected orders as {order_status}')(action)
+
+
 # Register Customer 
 @admin.register(Customer)
-class CustomersAdmin(admin.ModelAdmin):
+class CustomersAdmin(LargeTableAdmin):
     list_display = ('first_name', 'last_name', 'email', 'state')
+    search_fields = ('=email', 'first_name', 'last_name')
 
 # Register Categories
 @admin.register(Categories)
@@ -17,6 +77,7 @@ class CategoriesAdmin(admin.ModelAdmin):
 @admin.register(Product)
 class ProductsAdmin(admin.ModelAdmin):
     list_display = ('id','sku', 'product_name')
+    search_fields = ('=sku', 'product_name')
 
 # Register Color
 @admin.register(Color)
@@ -28,15 +89,52 @@ class ColorAdmin(admin.ModelAdmin):
 class SizeAdmin(admin.ModelAdmin):
     list_display = ('id', 'size')
 
+# Product Variation Admin Form
+# The stock the page showed is posted back, a stock edit is the change from it
+class ProductVariationAdminForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['stock'].show_hidden_initial = True
+
+    def clean_stock(self):
+        stock = self.cleaned_data['stock']
+        field = self.fields['stock']
+        shown = field.hidden_widget().value_from_datadict(self.data, self.files, self.add_initial_prefix('stock'))
+        self.stock_change = stock - field.clean(shown)
+        return stock
+
+
 # Register Product Variation
 @admin.register(ProductVariation)
-class ProductVariationAdmin(admin.ModelAdmin):
-    list_display = ('id', 'product', 'color', 'size', 'discount_price', 'stock')
+class ProductVariationAdmin(LargeTableAdmin):
+    form = ProductVariationAdminForm
+    list_display = ('id', 'product', 'color', 'size', 'discount_price', 'stock', 'held')
+    list_select_related = ('product', 'color', 'size')
+    autocomplete_fields = ('product',)
+    search_fields = ('=id', '=product__sku')
+    # Moved by cart holds only
+    readonly_fields = ('held',)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Orders and holds move stock and held while the form is open, so only the changed
+        # fields are written and a stock edit is added to the current stock
+        fields = [name for name in form.changed_data if name != 'stock']
+        with transaction.atomic():
+            if fields:
+                obj.save(update_fields=fields)
+            if 'stock' in form.changed_data:
+                ProductVariation.objects.filter(pk=obj.pk).update(stock=F('stock') + form.stock_change)
+                stock_changed.send(sender=ProductVariation, variation_ids=[obj.pk])
+                obj.refresh_from_db(fields=['stock', 'held'])
 
 # Register Product Image
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ('product', 'color', 'image')
+    list_select_related = ('product', 'color')
+    autocomplete_fields = ('product',)
 
 # Register Product Offer
 @admin.register(ProductOffer)
@@ -45,8 +143,10 @@ class ProductOfferAdmin(admin.ModelAdmin):
 
 # Register Cart
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
-    list_display = ('id', 'customer', 'product', 'quantity')
+class CartAdmin(LargeTableAdmin):
+    list_display = ('id', 'customer', 'product', 'quantity', 'added_at')
+    list_select_related = ('customer', 'product__product', 'product__color', 'product__size')
+    raw_id_fields = ('customer', 'product')
 
 # Register Hero Slider
 @admin.register(HeroSlider)
@@ -65,10 +165,35 @@ class ShipmentAddressAdmin(admin.ModelAdmin):
 
 # Register Category Slider
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = ('id', 'razorpay_payment_id', 'payment_date', 'amount', 'payment_status')
+    raw_id_fields = ('customer',)
+    search_fields = ('=razorpay_payment_id',)
 
 # Register Category Slider
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ('order_id', 'product_variation', 'quantity', 'total_amount')
\ No newline at end of file
+class OrderAdmin(LargeTableAdmin):
+    list_display = ('order_id', 'customer', 'product_variation', 'quantity', 'total_amount', 'order_status', 'order_date')
+    list_select_related = ('customer', 'product_variation__product', 'product_variation__color', 'product_variation__size')
+    raw_id_fields = ('customer', 'payment', 'product_variation')
+    # Both filters have an index, see Order.Meta.indexes
+    list_filter = ('order_status', 'order_date')
+    # Exact matches only, so searches stay on indexes
+    search_fields = ('=order_id', '=payment__razorpay_payment_id', '=customer__email')
+    actions = [order_status_action(order_status) for order_status, label in Order._meta.get_field('order_status').choices]
+
+@admin.action(description='Retry selected jobs now')
+def retry_jobs(modeladmin, request, queryset):
+    updated = queryset.exclude(status='Running').update(
+        status='Queued', run_after=timezone.now(), attempts=0, claimed_by=''
+    )
+    modeladmin.message_user(request, f'{updated} jobs queued again.')
+
+
+# Register Job
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at')
+    list_filter = ('status',)
+    readonly_fields = ('claimed_by', 'claimed_at', 'last_error', 'created_at')
+    actions = [retry_jobs]
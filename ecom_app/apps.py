@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EcomAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ecom_app'
+
+    def ready(self):
+        # holds registers the expired hold sweep job
+        from . import checks, holds, signals  # noqa: F401
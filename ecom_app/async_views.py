@@ -0,0 +1,256 @@
+import json
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.pagination import Cursor
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from .authentication import CachedTokenAuthentication, revoke_cached_token
+from .facets import ProductFacetFilter
+from .hashing import HashingPoolSaturated, get_hashing_pool
+from .models import Customer, HeroSlider, Categories, Product
+from .pagination import ProductCursorPagination
+from .serializers import UserSerializer, HeroSliderSerializer, CategorySerializer, ProductSerializer
+from .snapshots import call_store, catalog_validators, get_snapshot_store, set_validators
+from .views import HeroSliderView, CategoryView, ProductView
+
+# Create your async views here.
+# These mirror the sync views for the ASGI entry point, see ecommerce/asgi_urls.py.
+
+def read_payload(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+    return request.POST.dict()
+
+
+def too_many_requests():
+    response = JsonResponse({
+        'status': 429,
+        'message': 'Too many requests, please try again shortly.'
+    }, status=429)
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+# Async Hashing View
+class AsyncHashingView(View):
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated like the DRF views, which are CSRF exempt too
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except HashingPoolSaturated:
+            return too_many_requests()
+
+
+# Async Register View
+class AsyncRegisterView(AsyncHashingView):
+    async def post(self, request, *args, **kwargs):
+        serializer = UserSerializer(data=read_payload(request))
+        if await sync_to_async(serializer.is_valid)():
+            user_data = serializer.validated_data
+            await get_hashing_pool().run(
+                Customer.objects.create_user,
+                email=user_data['email'],
+                password=user_data['password'],
+                first_name=user_data['first_name'],
+                last_name=user_data['last_name'],
+                country=user_data['country'],
+                address=user_data['address'],
+                city=user_data['city'],
+                state=user_data['state'],
+                zip=user_data['zip'],
+                phone=user_data['phone']
+            )
+            return JsonResponse({
+                'status': 200,
+                'message': 'Registration Successful',
+            })
+        return JsonResponse({
+            'status': 400,
+            'message': 'Something went wrong',
+            'error': serializer.errors
+        })
+
+
+# Async Login View
+class AsyncLoginView(AsyncHashingView):
+    async def post(self, request, *args, **kwargs):
+        data = read_payload(request)
+        user = await get_hashing_pool().run(authenticate, email=data.get('email'), password=data.get('password'))
+        if user is not None:
+            token, created = await Token.objects.aget_or_create(user=user)
+            return JsonResponse({
+                'status': 200,
+                'message': 'Login Successful',
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'email': user.email,
+                'token': token.key
+            })
+        return JsonResponse({
+            'status': 400,
+            'message': 'Invalid credentials'
+        })
+
+
+# Async Change Password View
+class AsyncChangePasswordView(AsyncHashingView):
+    async def put(self, request, *args, **kwargs):
+        try:
+            credentials = await sync_to_async(CachedTokenAuthentication().authenticate)(request)
+        except exceptions.AuthenticationFailed as e:
+            return JsonResponse({'detail': e.detail}, status=401)
+        if credentials is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        user, token = credentials
+
+        data = read_payload(request)
+        old_password = data.get('oldPassword')
+        new_password = data.get('newPassword')
+
+        pool = get_hashing_pool()
+        if not await pool.run(user.check_password, old_password):
+            return JsonResponse({"message": "Old password is incorrect"}, status=400)
+
+        try:
+            UserSerializer().validate_password(new_password or '')
+        except serializers.ValidationError as e:
+            return JsonResponse({
+                "status": 400,
+                "message": e.detail[0] if isinstance(e.detail, list) else e.detail
+            })
+
+        await pool.run(self.set_password, user, new_password)
+        await sync_to_async(revoke_cached_token)(token.key)
+
+        return JsonResponse({
+            "status": 200,
+            "message": "Password changed Successfully",
+        })
+
+    @staticmethod
+    def set_password(user, password):
+        user.set_password(password)
+        user.save(update_fields=['password'])
+
+
+# Async Catalog View
+# Conditional GET and snapshot lookups stay on the event loop for in-process stores
+# and run in a thread for cache backed ones, misses load rows with the async ORM.
+# Output matches the sync views byte for byte. Lists serialize every row of
+# queryset with serializer_class, views with other output override get_data().
+class AsyncCatalogView(View):
+    snapshot_tables = ()
+    queryset = None
+    serializer_class = None
+
+    async def get(self, request, *args, **kwargs):
+        etag, last_modified = await call_store(catalog_validators, self.snapshot_tables, 'json')
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            try:
+                response = await self.render(request, *args, **kwargs)
+            except exceptions.APIException as e:
+                return JsonResponse(e.detail if isinstance(e.detail, dict) else {'detail': e.detail}, status=e.status_code)
+            if response.status_code != 200:
+                return response
+        return set_validators(response, etag, last_modified)
+
+    async def render(self, request, *args, **kwargs):
+        store = get_snapshot_store()
+        key = await call_store(store.make_key, self.snapshot_tables, request.build_absolute_uri())
+        body = await call_store(store.get, key)
+        if body is None:
+            # Cached under the newest version, so rendered from the primary
+            body = JSONRenderer().render(await self.get_data(request, *args, **kwargs))
+            await call_store(store.set, key, body)
+        return HttpResponse(body, content_type='application/json')
+
+    async def get_data(self, request, *args, **kwargs):
+        rows = [row async for row in self.queryset.all().aiterator()]
+        return self.serializer_class(rows, many=True, context={'request': request}).data
+
+
+# Async Hero Slider View
+class AsyncHeroSliderView(AsyncCatalogView):
+    snapshot_tables = HeroSliderView.snapshot_tables
+    queryset = HeroSlider.objects.all()
+    serializer_class = HeroSliderSerializer
+
+
+# Async Category View
+class AsyncCategoryView(AsyncCatalogView):
+    snapshot_tables = CategoryView.snapshot_tables
+    queryset = Categories.objects.all()
+    serializer_class = CategorySerializer
+
+
+# Async Product View
+class AsyncProductView(AsyncCatalogView):
+    snapshot_tables = ProductView.snapshot_tables
+
+    async def get_data(self, request, *args, **kwargs):
+        api_request = Request(request)
+        paginator = ProductCursorPagination()
+        paginator.base_url = request.build_absolute_uri()
+        page_size = paginator.get_page_size(api_request)
+        cursor = paginator.decode_cursor(api_request)
+
+        facet_filter = ProductFacetFilter(api_request.query_params)
+        queryset = Product.objects.for_listing()
+        if facet_filter.active:
+            queryset = queryset.filter(id__in=facet_filter.product_ids())
+
+        # Keyset on id, producing the same cursors as DRF's CursorPagination
+        reverse = cursor is not None and cursor.reverse
+        if cursor is not None and cursor.position is not None:
+            if not cursor.position.isdigit():
+                raise exceptions.NotFound(paginator.invalid_cursor_message)
+            queryset = queryset.filter(**{'id__lt' if reverse else 'id__gt': int(cursor.position)})
+        queryset = queryset.order_by('-id' if reverse else 'id')[:page_size + 1]
+        products = [product async for product in queryset.aiterator(chunk_size=page_size + 1)]
+
+        has_more = len(products) > page_size
+        products = products[:page_size]
+        if reverse:
+            products.reverse()
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else cursor is not None and cursor.position is not None
+
+        data = {
+            'next': paginator.encode_cursor(Cursor(0, False, str(products[-1].id)))
+            if has_next and products else None,
+            'previous': paginator.encode_cursor(Cursor(0, True, str(products[0].id)))
+            if has_previous and products else None,
+            'results': ProductSerializer(products, many=True, context={'request': request}).data,
+        }
+        if paginator.cursor_query_param not in api_request.query_params:
+            data['facets'] = await facet_filter.acounts()
+        return data
+
+
+# Async Product Detail View
+class AsyncProductDetailView(AsyncCatalogView):
+    snapshot_tables = ProductView.snapshot_tables
+
+    async def render(self, request, *args, **kwargs):
+        try:
+            # Not cached, but read from the primary the ETag was taken from
+            product = await Product.objects.for_listing().aget(id=kwargs['id'])
+        except Product.DoesNotExist:
+            return JsonResponse({'detail': 'No Product matches the given query.'}, status=404)
+        context = {'request': request, 'color': request.GET.get('color')}
+        data = ProductSerializer(product, context=context).data
+        return HttpResponse(JSONRenderer().render(data), content_type='application/json')
@@ -0,0 +1,169 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+# Create your authentication here.
+
+# Left in place of a revoked token for revoked_timeout seconds, so a request that read
+# the token from the database just before the revocation cannot cache it again
+REVOKED = 'revoked'
+
+
+# Local Memory Token Cache (bounded LRU with a TTL, per process)
+class LocMemTokenCache:
+    def __init__(self, max_entries=10000, timeout=300, revoked_timeout=30):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.revoked_timeout = revoked_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        if value == REVOKED:
+            return None
+        # Pickled so every request gets its own copy of the user
+        return pickle.loads(value)
+
+    def _store(self, key, timeout, value):
+        self._entries[key] = (time.monotonic() + timeout, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def add(self, key, token):
+        # Only where there is neither an entry nor a revocation
+        value = pickle.dumps(token, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                return
+            self._store(key, self.timeout, value)
+
+    def revoke(self, key):
+        with self._lock:
+            self._store(key, self.revoked_timeout, REVOKED)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Django Cache Token Cache (shared between workers)
+class DjangoTokenCache:
+    def __init__(self, alias='default', timeout=300, revoked_timeout=30, key_prefix='auth-token'):
+        self.alias = alias
+        self.timeout = timeout
+        self.revoked_timeout = revoked_timeout
+        self.key_prefix = key_prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        token = self.cache.get(f'{self.key_prefix}:{key}')
+        return None if token == REVOKED else token
+
+    def add(self, key, token):
+        # Only where there is neither an entry nor a revocation
+        self.cache.add(f'{self.key_prefix}:{key}', token, self.timeout)
+
+    def revoke(self, key):
+        self.cache.set(f'{self.key_prefix}:{key}', REVOKED, self.revoked_timeout)
+
+    def clear(self):
+        # Clears the whole cache alias, so point this backend at a dedicated one
+        self.cache.clear()
+
+
+# Token Cache with hit/miss counters
+class TokenCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        token = self.backend.get(key)
+        with self._lock:
+            if token is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return token
+
+    def add(self, key, token):
+        self.backend.add(key, token)
+
+    def revoke(self, key):
+        self.backend.revoke(key)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        config = settings.TOKEN_AUTH_CACHE
+        backend = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+        _token_cache = TokenCache(backend)
+    return _token_cache
+
+
+def revoke_cached_token(key):
+    get_token_cache().revoke(key)
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    global _token_cache
+    if setting == 'TOKEN_AUTH_CACHE':
+        _token_cache = None
+
+
+# Cached Token Authentication
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.add(key, token)
+        elif not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
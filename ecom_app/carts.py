@@ -0,0 +1,98 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import serializers
+from .models import Cart, ProductVariation
+from .snapshots import get_snapshot_store
+
+# Create your cart summaries here.
+
+MONEY = serializers.DecimalField(max_digits=12, decimal_places=2)
+LINE_COLUMNS = ('id', 'product_id', 'quantity', 'effective_price', 'line_total')
+STOCK_COLUMNS = ('held', 'available_stock', 'in_stock')
+
+
+def cart_cache():
+    return caches[settings.CART_SUMMARY['CACHE']]
+
+
+def cart_version_key(user_id):
+    return f'cart-version:{user_id}'
+
+
+def cart_version(user_id):
+    cache = cart_cache()
+    version = cache.get(cart_version_key(user_id))
+    if version is None:
+        # Seed with the clock so an evicted counter never reuses an old version
+        cache.add(cart_version_key(user_id), time.time_ns(), None)
+        version = cache.get(cart_version_key(user_id))
+    return version
+
+
+def invalidate_cart_summary(user_id):
+    # Called by every view that changes a cart, after its transaction commits. A new
+    # clock value, not incr, which is a get and a set on file and database caches:
+    # two racing bumps would land on the same version
+    cart_cache().set(cart_version_key(user_id), time.time_ns(), None)
+
+
+def build_cart_totals(user_id):
+    # The part of the summary only this cart and the prices change, which is cached
+    rows = list(Cart.objects.filter(customer_id=user_id).with_totals().order_by('id').values(
+        *LINE_COLUMNS, 'line_count', 'item_count', 'subtotal', 'discount',
+    ))
+    totals = rows[0] if rows else {'line_count': 0, 'item_count': 0, 'subtotal': 0, 'discount': 0}
+    return {
+        'line_count': totals['line_count'],
+        'item_count': totals['item_count'],
+        'subtotal': MONEY.to_representation(totals['subtotal']),
+        'discount': MONEY.to_representation(totals['discount']),
+        'lines': [
+            {
+                'id': row['id'],
+                'product_variation_id': row['product_id'],
+                'quantity': row['quantity'],
+                'effective_price': MONEY.to_representation(row['effective_price']),
+                'line_total': MONEY.to_representation(row['line_total']),
+            }
+            for row in rows
+        ],
+    }
+
+
+def add_stock(user_id, totals):
+    # Available stock moves with other customers' holds and the expiry sweep, so it
+    # is read fresh on every request
+    stock = {
+        row['id']: row for row in Cart.objects.filter(customer_id=user_id, product__isnull=False)
+        .with_stock().values('id', *STOCK_COLUMNS)
+    }
+    lines = [
+        {**line, **{column: stock[line['id']][column] for column in STOCK_COLUMNS}}
+        for line in totals['lines'] if line['id'] in stock
+    ]
+    return {
+        'line_count': totals['line_count'],
+        'item_count': totals['item_count'],
+        'subtotal': totals['subtotal'],
+        'discount': totals['discount'],
+        'out_of_stock': [line['product_variation_id'] for line in lines if not line['in_stock']],
+        'lines': lines,
+    }
+
+
+def build_cart_summary(user_id):
+    return add_stock(user_id, build_cart_totals(user_id))
+
+
+def get_cart_summary(user_id):
+    # The totals are keyed on the user's cart version and the variation table
+    # version, so cart changes and price edits miss the cache. Stock is added after
+    variation_version = get_snapshot_store().version([ProductVariation._meta.model_name])
+    key = f'cart-summary:{user_id}:{cart_version(user_id)}:{variation_version}'
+    totals = cart_cache().get(key)
+    if totals is None:
+        totals = build_cart_totals(user_id)
+        cart_cache().set(key, totals, settings.CART_SUMMARY['TIMEOUT'])
+    return add_stock(user_id, totals)
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Create your checks here.
+
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def is_process_local(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_CACHES
+
+
+def process_local_snapshots():
+    snapshot = settings.CATALOG_SNAPSHOT
+    return snapshot['BACKEND'] == 'ecom_app.snapshots.LocMemSnapshotBackend' or is_process_local(
+        snapshot.get('OPTIONS', {}).get('alias', 'default')
+    )
+
+
+# State one worker invalidates has to reach every other worker, a cache that
+# lives in one process silently serves stale data everywhere else
+@register()
+def check_shared_caches(app_configs, **kwargs):
+    errors = []
+    if process_local_snapshots():
+        errors.append(Error(
+            'CATALOG_SNAPSHOT keeps catalog snapshots in process memory, other workers never see invalidations.',
+            hint='Use ecom_app.snapshots.DjangoCacheSnapshotBackend on a shared cache, or silence '
+                 'ecom_app.E001 when only one process ever runs.',
+            id='ecom_app.E001',
+        ))
+    token = settings.TOKEN_AUTH_CACHE
+    if token['BACKEND'] == 'ecom_app.authentication.LocMemTokenCache' or is_process_local(
+        token.get('OPTIONS', {}).get('alias', 'default')
+    ):
+        errors.append(Error(
+            'TOKEN_AUTH_CACHE keeps authenticated users in process memory, a revoked token keeps '
+            'working on every other worker until it expires.',
+            hint='Use ecom_app.authentication.DjangoTokenCache on a shared cache, or silence '
+                 'ecom_app.E002 when only one process ever runs.',
+            id='ecom_app.E002',
+        ))
+    if is_process_local(settings.CART_SUMMARY['CACHE']):
+        errors.append(Error(
+            'CART_SUMMARY caches cart summaries in process memory, other workers keep serving '
+            'a summary after the cart changed.',
+            hint='Point CART_SUMMARY["CACHE"] at a shared cache, or silence ecom_app.E003 when '
+                 'only one process ever runs.',
+            id='ecom_app.E003',
+        ))
+    return errors
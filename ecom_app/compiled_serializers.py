@@ -0,0 +1,234 @@
+import functools
+from collections import defaultdict
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.db.models import F
+from rest_framework import serializers
+from rest_framework.relations import PKOnlyObject
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .models import ProductImage
+from .serializers import ProductSerializer, ProductImageSerializer, SrcsetField
+
+# Create your compiled serializers here.
+
+PARENT_COLUMN = '_compiled_parent'
+COLOR_COLUMN = '_compiled_color'
+
+
+def resolve_source(model, source):
+    # A dotted DRF source as a values() column, with the model field at its end
+    parts = source.split('.')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    return '__'.join(parts), model._meta.get_field(parts[-1])
+
+
+def find_relation(model, accessor):
+    # The field behind a related manager name such as productvariation_set
+    for field in model._meta.get_fields():
+        is_reverse = field.auto_created and not field.concrete
+        if (field.get_accessor_name() if is_reverse else field.name) == accessor:
+            return field
+    raise ImproperlyConfigured(f'{model.__name__} has no relation {accessor}.')
+
+
+def reverse_lookup(relation):
+    # The lookup that leads from the related model back to the model owning relation
+    if relation.auto_created and not relation.concrete:
+        return relation.field.name
+    return relation.related_query_name()
+
+
+def pk_representation(field):
+    if field.pk_field is None:
+        return None
+    return lambda value: field.to_representation(PKOnlyObject(value))
+
+
+def leaf_reader(column, field, model_field):
+    if isinstance(field, SrcsetField):
+        return lambda row, context, related: field.srcset(row[column], context.get('request'))
+
+    if isinstance(model_field, models.FileField):
+        # The model attribute is a FieldFile, which DRF never sees as null
+        if not isinstance(field, serializers.FileField):
+            to_representation = field.to_representation
+            return lambda row, context, related: to_representation(row[column] or '')
+        if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return lambda row, context, related: row[column] or None
+        storage = model_field.storage
+
+        def read_url(row, context, related):
+            name = row[column]
+            if not name:
+                return None
+            url = storage.url(name)
+            request = context.get('request')
+            return request.build_absolute_uri(url) if request is not None else url
+        return read_url
+
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        to_representation = pk_representation(field)
+    elif (
+        (type(field) is serializers.IntegerField and isinstance(model_field, models.IntegerField))
+        or (type(field) is serializers.BooleanField and isinstance(model_field, models.BooleanField))
+        or (type(field) is serializers.CharField and isinstance(model_field, (models.CharField, models.TextField)))
+    ):
+        # Values from the database already are what to_representation would return
+        to_representation = None
+    else:
+        to_representation = field.to_representation
+
+    if to_representation is None:
+        return lambda row, context, related: row[column]
+
+    def read(row, context, related):
+        value = row[column]
+        return None if value is None else to_representation(value)
+    return read
+
+
+# Compiled Serializer
+# Renders the same data as a ModelSerializer from values() rows, without model
+# instances or per-row field lookups. Nested objects are read from joined columns
+# in the same row, nested lists are fetched with one query per list.
+class CompiledSerializer:
+    def __init__(self, serializer_class, method_fields=None):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.pk_column = self.model._meta.pk.name
+        self.method_fields = method_fields or {}
+        self.columns = [self.pk_column]
+        self.fetchers = []
+        self.readers = self.compile(serializer_class().fields, self.model, prefix='')
+
+    def add_column(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+        return column
+
+    def compile(self, fields, model, prefix):
+        readers = []
+        for name, field in fields.items():
+            if isinstance(field, serializers.SerializerMethodField):
+                readers.append((name, self.compile_method_field(name, prefix)))
+            elif isinstance(field, serializers.ListSerializer):
+                readers.append((name, self.compile_nested_list(name, field, model, prefix)))
+            elif isinstance(field, serializers.ManyRelatedField):
+                readers.append((name, self.compile_pk_list(name, field, model, prefix)))
+            elif isinstance(field, serializers.Serializer):
+                readers.append((name, self.compile_nested(field, model, prefix)))
+            else:
+                column, model_field = resolve_source(model, field.source)
+                readers.append((name, leaf_reader(self.add_column(prefix + column), field, model_field)))
+        return readers
+
+    def compile_nested(self, field, model, prefix):
+        column, model_field = resolve_source(model, field.source)
+        fk_column = self.add_column(prefix + column)
+        nested = self.compile(field.fields, model_field.related_model, prefix=f'{fk_column}__')
+
+        def read(row, context, related):
+            if row[fk_column] is None:
+                return None
+            return {name: reader(row, context, related) for name, reader in nested}
+        return read
+
+    def compile_many(self, name, prefix, fetch):
+        # Related lists are keyed by this model's pk, so only top level fields can have them
+        if prefix:
+            raise ImproperlyConfigured(f'Cannot compile {name}, a list inside a nested object.')
+        self.fetchers.append((name, fetch))
+        pk_column = self.pk_column
+        return lambda row, context, related: related[name][row[pk_column]]
+
+    def compile_method_field(self, name, prefix):
+        if name not in self.method_fields:
+            raise ImproperlyConfigured(f'Cannot compile {self.serializer_class.__name__}.{name} without a bulk method.')
+        return self.compile_many(name, prefix, self.method_fields[name])
+
+    def compile_nested_list(self, name, field, model, prefix):
+        relation = find_relation(model, field.source)
+        lookup = reverse_lookup(relation)
+        child = get_compiled_serializer(type(field.child))
+
+        def fetch(ids, context):
+            queryset = child.model._default_manager.filter(**{f'{lookup}__in': ids}).order_by(child.pk_column)
+            rows = list(child.values(queryset, **{PARENT_COLUMN: F(lookup)}))
+            grouped = defaultdict(list)
+            for row, item in zip(rows, child.serialize(rows, context)):
+                grouped[row[PARENT_COLUMN]].append(item)
+            return grouped
+        return self.compile_many(name, prefix, fetch)
+
+    def compile_pk_list(self, name, field, model, prefix):
+        relation = find_relation(model, field.source)
+        lookup = reverse_lookup(relation)
+        target = relation.related_model
+        to_representation = pk_representation(field.child_relation)
+
+        def fetch(ids, context):
+            queryset = target._default_manager.filter(**{f'{lookup}__in': ids}).order_by('pk')
+            grouped = defaultdict(list)
+            for parent_id, pk in queryset.values_list(lookup, 'pk'):
+                grouped[parent_id].append(pk if to_representation is None else to_representation(pk))
+            return grouped
+        return self.compile_many(name, prefix, fetch)
+
+    def values(self, queryset, **expressions):
+        return queryset.prefetch_related(None).values(*self.columns, **expressions)
+
+    def serialize(self, rows, context=None):
+        context = context or {}
+        rows = list(rows)
+        if not rows:
+            return []
+        ids = list({row[self.pk_column] for row in rows})
+        related = {name: fetch(ids, context) for name, fetch in self.fetchers}
+        readers = self.readers
+        return [{name: reader(row, context, related) for name, reader in readers} for row in rows]
+
+
+def product_images(ids, context):
+    # Same in-memory color match as ProductSerializer.get_images on prefetched images
+    images = defaultdict(list)
+    color = context.get('color')
+    if color is None:
+        return images
+    compiled = get_compiled_serializer(ProductImageSerializer)
+    queryset = ProductImage.objects.filter(product_id__in=ids).order_by('id')
+    rows = [
+        row for row in compiled.values(queryset, **{PARENT_COLUMN: F('product'), COLOR_COLUMN: F('color')})
+        if str(row[COLOR_COLUMN]) == str(color)
+    ]
+    # get_images renders without the request, so image urls stay relative
+    for row, item in zip(rows, compiled.serialize(rows)):
+        images[row[PARENT_COLUMN]].append(item)
+    return images
+
+
+METHOD_FIELDS = {
+    ProductSerializer: {'images': product_images},
+}
+
+
+@functools.cache
+def get_compiled_serializer(serializer_class):
+    return CompiledSerializer(serializer_class, METHOD_FIELDS.get(serializer_class))
+
+
+# Compiled List Mixin
+# list() for generic views, serialized with the compiled form of serializer_class
+class CompiledListMixin:
+    def list(self, request, *args, **kwargs):
+        if not settings.API_COMPILED_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        compiled = get_compiled_serializer(self.get_serializer_class())
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        data = compiled.serialize(page if page is not None else queryset, self.get_serializer_context())
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
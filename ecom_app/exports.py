@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Order
+from .routers import replica_reads
+
+# Create your exports here.
+
+# Export column -> Order values() path
+EXPORT_COLUMNS = (
+    ('order_id', 'order_id'),
+    ('order_date', 'order_date'),
+    ('order_status', 'order_status'),
+    ('order_status_date', 'order_status_date'),
+    ('quantity', 'quantity'),
+    ('total_amount', 'total_amount'),
+    ('customer_id', 'customer_id'),
+    ('customer_email', 'customer__email'),
+    ('customer_first_name', 'customer__first_name'),
+    ('customer_last_name', 'customer__last_name'),
+    ('payment_id', 'payment_id'),
+    ('razorpay_payment_id', 'payment__razorpay_payment_id'),
+    ('payment_amount', 'payment__amount'),
+    ('payment_status', 'payment__payment_status'),
+    ('payment_date', 'payment__payment_date'),
+    ('product_variation_id', 'product_variation_id'),
+    ('product_id', 'product_variation__product_id'),
+    ('sku', 'product_variation__product__sku'),
+    ('product_name', 'product_variation__product__product_name'),
+    ('color', 'product_variation__color__color'),
+    ('size', 'product_variation__size__size'),
+    ('original_price', 'product_variation__original_price'),
+    ('discount_price', 'product_variation__discount_price'),
+)
+COLUMN_NAMES = [name for name, path in EXPORT_COLUMNS]
+
+
+def parse_export_filters(start=None, end=None, after_order_id=None):
+    # Raises ValueError with a message fit for the API and the command alike
+    filters = {}
+    for name, value in (('start', start), ('end', end)):
+        if value:
+            parsed = parse_date(value) if isinstance(value, str) else value
+            if parsed is None:
+                raise ValueError(f'{name} must be a date as YYYY-MM-DD.')
+            filters[name] = parsed
+    if after_order_id not in (None, ''):
+        try:
+            filters['after_order_id'] = int(after_order_id)
+        except (TypeError, ValueError):
+            raise ValueError('after_order_id must be an order id.')
+    return filters
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(start=None, end=None, after_order_id=None):
+    queryset = Order.objects.all()
+    if start:
+        queryset = queryset.filter(order_date__gte=day_start(start))
+    if end:
+        # Inclusive end date, as finance asks for whole days
+        queryset = queryset.filter(order_date__lt=day_start(end + timedelta(days=1)))
+    if after_order_id:
+        queryset = queryset.filter(order_id__gt=after_order_id)
+    return queryset.order_by('order_id').values_list(*[path for name, path in EXPORT_COLUMNS])
+
+
+def export_chunks(queryset, chunk_size):
+    # Keyset chunks on order_id, so the last id of a chunk is the resume watermark
+    last_order_id = None
+    while True:
+        chunk = queryset if last_order_id is None else queryset.filter(order_id__gt=last_order_id)
+        with replica_reads():
+            rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_order_id = rows[-1][0]
+
+
+# NDJSON Export Format
+class NdjsonFormat:
+    content_type = 'application/x-ndjson'
+    extension = 'ndjson'
+
+    def header(self):
+        return ''
+
+    def lines(self, rows):
+        return ''.join(json.dumps(dict(zip(COLUMN_NAMES, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+
+
+# CSV Export Format
+class CsvFormat:
+    content_type = 'text/csv'
+    extension = 'csv'
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def header(self):
+        return self.lines([COLUMN_NAMES])
+
+    def lines(self, rows):
+        self.writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+        text = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return text
+
+
+EXPORT_FORMATS = {
+    'ndjson': NdjsonFormat,
+    'csv': CsvFormat,
+}
+
+
+def export_orders(export_format, chunk_size=None, **filters):
+    # Yields (text, rows, last order_id written) per chunk, the header comes with no rows
+    output = EXPORT_FORMATS[export_format]()
+    header = output.header()
+    if header:
+        yield header, 0, None
+    queryset = export_queryset(**filters)
+    for rows in export_chunks(queryset, chunk_size or settings.EXPORT_CHUNK_SIZE):
+        yield output.lines(rows), len(rows), rows[-1][0]
@@ -0,0 +1,160 @@
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from .jobs import job
+from .models import Product, ProductVariation, ProductFacet
+from .snapshots import get_snapshot_store
+
+# Create your product facets here.
+
+MULTI_VALUE_FACETS = ('category', 'color', 'size')
+BOOLEAN_FACETS = ('new', 'featured', 'in_stock')
+TRUE_VALUES = ('1', 'true', 'yes')
+FALSE_VALUES = ('0', 'false', 'no')
+
+
+def facet_rows(product, variations, category_ids):
+    for variation in variations:
+        for category_id in category_ids or [None]:
+            yield ProductFacet(
+                product_id=product.id,
+                variation_id=variation.id,
+                category_id=category_id,
+                color_id=variation.color_id,
+                size_id=variation.size_id,
+                price=variation.discount_price if variation.discount_price is not None else variation.original_price,
+                in_stock=variation.stock > 0,
+                new=product.new,
+                featured=product.featured,
+            )
+
+
+def rebuild_product_facets(product_ids):
+    # Replace the facet rows of the given products in a fixed number of queries
+    product_ids = list(product_ids)
+    products = Product.objects.filter(id__in=product_ids).prefetch_related('productvariation_set')
+    category_links = Product.category.through.objects.filter(product_id__in=product_ids)
+    categories = {}
+    for product_id, category_id in category_links.values_list('product_id', 'categories_id'):
+        categories.setdefault(product_id, []).append(category_id)
+
+    with transaction.atomic():
+        ProductFacet.objects.filter(product_id__in=product_ids).delete()
+        ProductFacet.objects.bulk_create([
+            row
+            for product in products
+            for row in facet_rows(product, product.productvariation_set.all(), categories.get(product.id))
+        ])
+    get_snapshot_store().invalidate('productfacet')
+
+
+@job
+def refresh_stock_facets(variation_ids):
+    # Stock only moves the in_stock flag, so skip the full rebuild
+    in_stock = ProductVariation.objects.filter(id__in=variation_ids, stock__gt=0).values('id')
+    ProductFacet.objects.filter(variation_id__in=variation_ids).exclude(variation_id__in=in_stock).update(in_stock=False)
+    ProductFacet.objects.filter(variation_id__in=in_stock).update(in_stock=True)
+    get_snapshot_store().invalidate('productfacet')
+
+
+# Product Facet Filter
+class ProductFacetFilter:
+    def __init__(self, params):
+        self.values = {}
+        for name in MULTI_VALUE_FACETS:
+            if params.get(name):
+                self.values[name] = self.parse_ids(name, params[name])
+        for name in BOOLEAN_FACETS:
+            if params.get(name):
+                self.values[name] = self.parse_bool(name, params[name])
+        for name in ('min_price', 'max_price'):
+            if params.get(name):
+                self.values[name] = self.parse_price(name, params[name])
+
+    @property
+    def active(self):
+        return bool(self.values)
+
+    def parse_ids(self, name, value):
+        try:
+            return [int(item) for item in value.split(',') if item]
+        except ValueError:
+            raise ValidationError({name: 'Expected a comma separated list of ids.'})
+
+    def parse_bool(self, name, value):
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+        raise ValidationError({name: 'Expected true or false.'})
+
+    def parse_price(self, name, value):
+        try:
+            return float(value)
+        except ValueError:
+            raise ValidationError({name: 'Expected a number.'})
+
+    def condition(self, exclude=()):
+        condition = Q()
+        for name, value in self.values.items():
+            if name in exclude:
+                continue
+            if name in MULTI_VALUE_FACETS:
+                condition &= Q(**{f'{name}_id__in': value})
+            elif name in BOOLEAN_FACETS:
+                condition &= Q(**{name: value})
+            elif name == 'min_price':
+                condition &= Q(price__gte=value)
+            elif name == 'max_price':
+                condition &= Q(price__lte=value)
+        return condition
+
+    def product_ids(self):
+        return ProductFacet.objects.filter(self.condition()).values('product_id')
+
+    def dimension_queries(self):
+        # Each dimension is counted with every filter except its own applied,
+        # four queries in total whatever the filters are
+        return {
+            name: (
+                ProductFacet.objects.filter(self.condition(exclude=(name,)), **{f'{name}_id__isnull': False})
+                .values_list(f'{name}_id')
+                .annotate(count=Count('product', distinct=True))
+                .order_by(f'{name}_id')
+            )
+            for name in MULTI_VALUE_FACETS
+        }
+
+    def totals_query(self):
+        price_filters = ('min_price', 'max_price')
+        queryset = ProductFacet.objects.filter(self.condition(exclude=BOOLEAN_FACETS + price_filters))
+        aggregates = {
+            f'{name}_count': Count('product', distinct=True, filter=Q(**{name: True}) & self.condition(exclude=(name,) + MULTI_VALUE_FACETS))
+            for name in BOOLEAN_FACETS
+        }
+        aggregates['min_price'] = Min('price', filter=self.condition(exclude=MULTI_VALUE_FACETS + price_filters))
+        aggregates['max_price'] = Max('price', filter=self.condition(exclude=MULTI_VALUE_FACETS + price_filters))
+        return queryset, aggregates
+
+    def build_counts(self, dimensions, totals):
+        facets = {name: dict(rows) for name, rows in dimensions.items()}
+        for name in BOOLEAN_FACETS:
+            facets[name] = totals[f'{name}_count']
+        # Render prices the same way the variation serializer does
+        price_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+        facets['price'] = {
+            bound: price_field.to_representation(totals[f'{bound}_price']) if totals[f'{bound}_price'] is not None else None
+            for bound in ('min', 'max')
+        }
+        return facets
+
+    def counts(self):
+        dimensions = {name: list(query) for name, query in self.dimension_queries().items()}
+        queryset, aggregates = self.totals_query()
+        return self.build_counts(dimensions, queryset.aggregate(**aggregates))
+
+    async def acounts(self):
+        dimensions = {name: [row async for row in query] for name, query in self.dimension_queries().items()}
+        queryset, aggregates = self.totals_query()
+        return self.build_counts(dimensions, await queryset.aaggregate(**aggregates))
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.dispatch import receiver
+
+# Create your hashing pool here.
+
+class HashingPoolSaturated(Exception):
+    pass
+
+
+# Bounded Hashing Pool
+# Password hashing runs on its own threads, so a login burst queues here instead of
+# taking the threads that serve the catalog, and is refused once the queue is full
+class HashingPool:
+    def __init__(self, max_workers=4, max_pending=32):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hashing')
+        self._lock = threading.Lock()
+
+    async def run(self, func, *args, **kwargs):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingPoolSaturated()
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(self._call, func, *args, **kwargs))
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    @staticmethod
+    def _call(func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Pool threads live outside the request cycle, so tidy their connections here
+            close_old_connections()
+
+    def stats(self):
+        with self._lock:
+            return {'pending': self.pending, 'completed': self.completed, 'rejected': self.rejected}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_pool = None
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        _pool = HashingPool(**settings.HASHING_POOL)
+    return _pool
+
+
+@receiver(setting_changed)
+def reset_hashing_pool(setting, **kwargs):
+    global _pool
+    if setting == 'HASHING_POOL' and _pool is not None:
+        _pool.shutdown()
+        _pool = None
@@ -0,0 +1,129 @@
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .jobs import enqueue, job
+from .models import ProductVariation, StockHold
+
+# Create your stock holds here.
+
+
+def hold_expiry():
+    return timezone.now() + timedelta(seconds=settings.STOCK_HOLDS['SECONDS'])
+
+
+def set_holds(customer_id, quantities):
+    # Moves the customer's holds to {variation id: quantity}, 0 or less dropping a hold, and
+    # restarts their expiry. Returns the id of a variation without enough available
+    # stock, changing nothing, or None.
+    expires_at = hold_expiry()
+    with transaction.atomic():
+        # The customer's own holds are locked first, so a sweep never waits on a
+        # variation this holds while this waits on a hold the sweep took
+        holds = {
+            hold.variation_id: hold
+            for hold in StockHold.objects.select_for_update().filter(customer_id=customer_id, variation_id__in=list(quantities))
+        }
+        changes = {}
+        quantities = {variation_id: max(quantity, 0) for variation_id, quantity in quantities.items()}
+        for variation_id, quantity in quantities.items():
+            change = quantity - (holds[variation_id].quantity if variation_id in holds else 0)
+            if change:
+                changes[variation_id] = change
+
+        if ProductVariation.objects.change_held_stock(changes):
+            dropped = [hold.id for variation_id, hold in holds.items() if quantities[variation_id] <= 0]
+            if dropped:
+                StockHold.objects.filter(id__in=dropped).delete()
+            kept = []
+            for variation_id, hold in holds.items():
+                if quantities[variation_id] > 0:
+                    hold.quantity = quantities[variation_id]
+                    hold.expires_at = expires_at
+                    kept.append(hold)
+            if kept:
+                StockHold.objects.bulk_update(kept, ['quantity', 'expires_at'])
+            StockHold.objects.bulk_create([
+                StockHold(customer_id=customer_id, variation_id=variation_id, quantity=quantity, expires_at=expires_at)
+                for variation_id, quantity in quantities.items() if quantity > 0 and variation_id not in holds
+            ])
+            if any(quantity > 0 for quantity in quantities.values()):
+                # Expired holds keep their stock from everyone else until swept
+                transaction.on_commit(lambda: schedule_hold_sweep(expires_at))
+            return None
+        transaction.set_rollback(True)
+
+    # Rolled back by now, so the variations still short of stock are the ones that failed
+    rises = {variation_id: change for variation_id, change in changes.items() if change > 0}
+    short = ProductVariation.objects.filter(
+        id__in=list(rises), stock__lt=F('held') + ProductVariation.objects.held_stock_change(rises)
+    ).order_by('id').values_list('id', flat=True).first()
+    return short or min(rises)
+
+
+def convert_holds(customer_id, quantities):
+    # Sells {variation id: quantity} for an order, out of the customer's holds first.
+    # What the order doesn't use stays held. Call inside the order's transaction.
+    # Returns the id of a variation without enough stock, with the transaction
+    # marked for rollback, or None.
+    holds = dict(
+        StockHold.objects.select_for_update().filter(customer_id=customer_id, variation_id__in=quantities)
+        .values_list('variation_id', 'quantity')
+    )
+    used = {variation_id: min(holds.get(variation_id, 0), quantity) for variation_id, quantity in quantities.items()}
+    # Expired holds still count until the sweep releases them, so they are sold as well
+    for variation_id in sorted(quantities):
+        if not ProductVariation.objects.convert_held_stock(variation_id, quantities[variation_id], used[variation_id]):
+            transaction.set_rollback(True)
+            return variation_id
+    customer_holds = StockHold.objects.filter(customer_id=customer_id)
+    customer_holds.filter(variation_id__in=[
+        variation_id for variation_id, quantity in holds.items() if quantity == used[variation_id]
+    ]).delete()
+    for variation_id, quantity in holds.items():
+        if quantity > used[variation_id]:
+            customer_holds.filter(variation_id=variation_id).update(quantity=quantity - used[variation_id])
+    return None
+
+
+def schedule_hold_sweep(expires_at):
+    # Queues a sweep on the job queue for holds expiring by expires_at, rounded up to
+    # SWEEP_INTERVAL so busy carts share one sweep per interval. Duplicates from a
+    # cache miss are harmless, the sweep is idempotent.
+    interval = settings.STOCK_HOLDS['SWEEP_INTERVAL']
+    run_at = math.ceil(expires_at.timestamp() / interval) * interval
+    if caches['default'].add(f'stock-hold-sweep:{run_at}', True, run_at - time.time() + interval):
+        enqueue(release_expired_holds, delay=timedelta(seconds=max(run_at - time.time(), 0)))
+
+
+@job
+def release_expired_holds(chunk_size=None):
+    # Drops expired holds and returns their stock, a chunk per transaction so the
+    # variation rows are only locked briefly. Returns the number of holds released.
+    chunk_size = chunk_size or settings.STOCK_HOLDS['SWEEP_CHUNK_SIZE']
+    now = timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = StockHold.objects.filter(expires_at__lte=now).order_by('expires_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                # Holds a cart request has locked are left for the next sweep
+                expired = expired.select_for_update(skip_locked=True)
+            # On SQLite the first write locks the database, a cart request that got
+            # in between makes this transaction fail rather than release stale rows
+            holds = list(expired.values_list('id', 'variation_id', 'quantity')[:chunk_size])
+            if not holds:
+                return released
+            StockHold.objects.filter(id__in=[hold_id for hold_id, variation_id, quantity in holds]).delete()
+            changes = defaultdict(int)
+            for hold_id, variation_id, quantity in holds:
+                changes[variation_id] -= quantity
+            ProductVariation.objects.change_held_stock(changes)
+        released += len(holds)
+        if len(holds) < chunk_size:
+            return released
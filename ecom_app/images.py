@@ -0,0 +1,121 @@
+import hashlib
+import io
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import ExifTags, Image, ImageOps
+from .jobs import job
+from .snapshots import get_snapshot_store
+
+# Create your image derivatives here.
+
+# Image fields with derivatives, each stores its map in a <field>_srcset JSON column
+IMAGE_FIELDS = {
+    'ecom_app.Categories': ['category_image'],
+    'ecom_app.Product': ['list_image1', 'list_image2'],
+    'ecom_app.ProductImage': ['image'],
+    'ecom_app.HeroSlider': ['image'],
+    'ecom_app.CategorySlider': ['image'],
+}
+
+WEBP = 'image/webp'
+FALLBACK_FORMATS = {
+    # Pillow format, mime type, extension
+    False: ('JPEG', 'image/jpeg', 'jpg'),
+    True: ('PNG', 'image/png', 'png'),
+}
+
+
+def srcset_field(field_name):
+    return f'{field_name}_srcset'
+
+
+def derivative_name(digest, width, extension):
+    # Content addressed, the same upload under any name shares its derivatives
+    return f"{settings.IMAGE_DERIVATIVES['PATH']}/{digest[:2]}/{digest[2:]}/{width}w.{extension}"
+
+
+def target_widths(width):
+    # Never upscale, an image narrower than every width still gets one WebP copy
+    widths = [target for target in settings.IMAGE_DERIVATIVES['WIDTHS'] if target < width]
+    return widths or [width]
+
+
+def encode(image, pillow_format):
+    buffer = io.BytesIO()
+    if pillow_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=settings.IMAGE_DERIVATIVES['QUALITY'], method=4)
+    elif pillow_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=settings.IMAGE_DERIVATIVES['QUALITY'], optimize=True, progressive=True)
+    else:
+        image.save(buffer, pillow_format, optimize=True)
+    return buffer.getvalue()
+
+
+def build_derivatives(name, storage=default_storage):
+    # {'source': name, mime type: {width: derivative name}} for a stored image.
+    # Raises OSError for missing or unreadable files.
+    with storage.open(name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+        width, height = height, width
+    widths = target_widths(width)
+    # Lets JPEG decode at a fraction of full size when every width is much smaller
+    image.draft('RGB', (max(widths), max(widths)))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    fallback_format, fallback_type, fallback_extension = FALLBACK_FORMATS[has_alpha]
+
+    srcset = {'source': name, WEBP: {}, fallback_type: {}}
+    for width in widths:
+        resized = None
+        for pillow_format, mime_type, extension in (('WEBP', WEBP, 'webp'), (fallback_format, fallback_type, fallback_extension)):
+            derivative = derivative_name(digest, width, extension)
+            if not storage.exists(derivative):
+                if resized is None:
+                    height = max(1, round(image.height * width / image.width))
+                    resized = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                derivative = storage.save(derivative, ContentFile(encode(resized, pillow_format)))
+            srcset[mime_type][str(width)] = derivative
+    return srcset
+
+
+def mark_srcset(instance, field_name):
+    # Marks <field>_srcset pending when the image changed, True if it needs a build.
+    # Uploads are committed to storage here, before Django would, to know their final name.
+    field_file = getattr(instance, field_name)
+    current = getattr(instance, srcset_field(field_name)) or {}
+    if not field_file:
+        setattr(instance, srcset_field(field_name), {})
+        return False
+    if not field_file._committed:
+        field_file.save(field_file.name, field_file.file, save=False)
+    if current.get('source') == field_file.name:
+        return False
+    # Clients use the original image until build_srcset has run
+    setattr(instance, srcset_field(field_name), {'source': field_file.name, 'pending': True})
+    return True
+
+
+def store_srcset(model, field_name, name, srcset, pks):
+    # Rows that got another image meanwhile keep the srcset their own save asked for
+    rows = model._default_manager.filter(pk__in=pks, **{field_name: name})
+    if rows.update(**{srcset_field(field_name): srcset}):
+        # Queryset updates skip post_save, so bump the catalog table here
+        get_snapshot_store().invalidate(model._meta.model_name)
+
+
+@job
+def build_srcset(label, field_name, name, pk):
+    try:
+        srcset = build_derivatives(name)
+    except (Image.UnidentifiedImageError, Image.DecompressionBombError, ValueError):
+        # Not an image Pillow can read, a retry won't change that
+        srcset = {'source': name}
+    store_srcset(apps.get_model(label), field_name, name, srcset, [pk])
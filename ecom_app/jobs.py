@@ -0,0 +1,151 @@
+import os
+import random
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from .models import Job
+
+# Create your jobs here.
+
+# Job name -> function, filled by @job as modules are imported, so job modules
+# must be imported at startup (e.g. from signals.py) to be found by the workers
+JOBS = {}
+
+QUEUED, RUNNING, FAILED = 'Queued', 'Running', 'Failed'
+DONE, RETRIED = 'Done', 'Retried'
+
+
+def job(func=None, *, max_attempts=None):
+    # Registers func as a job. Jobs can run more than once, after a worker crash or a
+    # retry, so they must be idempotent, and take only JSON serializable arguments.
+    def register(func):
+        func.job_name = f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        JOBS[func.job_name] = func
+        return func
+    return register(func) if func is not None else register
+
+
+def enqueue(func, *, delay=None, **payload):
+    # The job row is written in the caller's transaction, so it only becomes
+    # visible to workers if the work that asked for it commits
+    return Job.objects.create(
+        name=func.job_name,
+        payload=payload,
+        max_attempts=func.max_attempts or settings.JOB_QUEUE['MAX_ATTEMPTS'],
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+
+
+def backoff(attempts):
+    # Exponential, capped, with jitter so failed jobs don't all come back at once
+    config = settings.JOB_QUEUE
+    seconds = min(config['BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['MAX_BACKOFF_SECONDS'])
+    return timedelta(seconds=seconds * random.uniform(0.5, 1))
+
+
+def claim_jobs(worker, limit):
+    now = timezone.now()
+    token = f'{worker[:51]}:{uuid.uuid4().hex[:12]}'
+    due = Job.objects.filter(status=QUEUED, run_after__lte=now).order_by('run_after', 'id')
+    if connection.features.has_select_for_update_skip_locked:
+        # MySQL 8 and PostgreSQL, workers skip each other's rows instead of queueing on them
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(
+                status=RUNNING, claimed_by=token, claimed_at=now, attempts=F('attempts') + 1
+            )
+        return list(Job.objects.filter(id__in=ids, claimed_by=token).order_by('run_after', 'id'))
+
+    # SQLite locks the whole database on write, so no row locks. The status in the
+    # UPDATE makes the claim safe, jobs taken by another worker meanwhile are skipped
+    # and, if that leaves nothing, the next due jobs are tried
+    while True:
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        if Job.objects.filter(id__in=ids, status=QUEUED).update(
+            status=RUNNING, claimed_by=token, claimed_at=now, attempts=F('attempts') + 1
+        ):
+            return list(Job.objects.filter(id__in=ids, claimed_by=token).order_by('run_after', 'id'))
+
+
+def run_job(job):
+    func = JOBS.get(job.name)
+    # A claim that timed out may have been handed to another worker, whose row this is now
+    claimed = Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by)
+    try:
+        if func is None:
+            raise LookupError(f'No job named {job.name}, is its module imported at startup?')
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            claimed.update(status=FAILED, last_error=error)
+            return FAILED
+        claimed.update(
+            status=QUEUED, run_after=timezone.now() + backoff(job.attempts), last_error=error, claimed_by='',
+        )
+        return RETRIED
+    claimed.delete()
+    return DONE
+
+
+def requeue_stale_jobs():
+    # Jobs claimed by a worker that died never finish, hand them out again
+    stale = Job.objects.filter(
+        status=RUNNING, claimed_at__lt=timezone.now() - timedelta(seconds=settings.JOB_QUEUE['CLAIM_TIMEOUT'])
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=FAILED, last_error='Claim timed out, the worker running it stopped.'
+    )
+    return failed + stale.update(status=QUEUED, claimed_by='')
+
+
+def queue_metrics():
+    # Queue depth and lag in one aggregate query
+    now = timezone.now()
+    metrics = Job.objects.aggregate(
+        queued=Count('id', filter=Q(status=QUEUED)),
+        due=Count('id', filter=Q(status=QUEUED, run_after__lte=now)),
+        running=Count('id', filter=Q(status=RUNNING)),
+        failed=Count('id', filter=Q(status=FAILED)),
+        oldest_due=Min('run_after', filter=Q(status=QUEUED, run_after__lte=now)),
+    )
+    oldest_due = metrics.pop('oldest_due')
+    metrics['lag_seconds'] = (now - oldest_due).total_seconds() if oldest_due else 0.0
+    return metrics
+
+
+def worker_name(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def work(worker, stop, counters, burst=False, report=None):
+    # Claims and runs jobs until stop is set, or the queue has no due job in burst mode.
+    # counters maps DONE, RETRIED and FAILED to multiprocessing Values, report is
+    # called between batches
+    config = settings.JOB_QUEUE
+    while not stop.is_set():
+        if report is not None:
+            report()
+        # Long running process, drop connections that went away or outlived CONN_MAX_AGE,
+        # unless a caller's transaction is open on them
+        if not connection.in_atomic_block:
+            close_old_connections()
+        jobs = claim_jobs(worker, config['BATCH_SIZE'])
+        if not jobs:
+            if burst:
+                return
+            stop.wait(config['POLL_SECONDS'])
+            continue
+        for claimed in jobs:
+            outcome = run_job(claimed)
+            with counters[outcome].get_lock():
+                counters[outcome].value += 1
+
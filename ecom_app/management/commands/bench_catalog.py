@@ -0,0 +1,112 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from ecommerce.asgi import AsyncRoutesASGIHandler
+
+
+def summarize(latencies, elapsed, statuses):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': sum(1 for status in statuses if status >= 400),
+        'req_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def request_urls(path, requests, cold):
+    # A unique query string per request defeats the snapshot cache when measuring cold renders
+    separator = '&' if '?' in path else '?'
+    return [f'{path}{separator}_bench={index}' if cold else path for index in range(requests)]
+
+
+def bench_wsgi(urls, concurrency):
+    handler = WSGIHandler()
+
+    def fetch(url):
+        parts = urlsplit(url)
+        environ = {'PATH_INFO': parts.path, 'QUERY_STRING': parts.query, 'HTTP_HOST': 'localhost'}
+        setup_testing_defaults(environ)
+        environ['wsgi.input'] = io.BytesIO()
+        status = []
+        started = time.perf_counter()
+        response = handler(environ, lambda code, headers, exc_info=None: status.append(int(code[:3])))
+        b''.join(response)
+        response.close()
+        return time.perf_counter() - started, status[0]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(fetch, urls))
+        elapsed = time.perf_counter() - started
+    return summarize([latency for latency, status in results], elapsed, [status for latency, status in results])
+
+
+def bench_asgi(urls, concurrency):
+    application = AsyncRoutesASGIHandler()
+
+    async def fetch(url, semaphore):
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': parts.path, 'raw_path': parts.path.encode(), 'root_path': '',
+            'query_string': parts.query.encode(), 'headers': [(b'host', b'localhost')],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Never disconnects, Django cancels this once the response is sent
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with semaphore:
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            return time.perf_counter() - started, status[0]
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(fetch(url, semaphore) for url in urls))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+    return summarize([latency for latency, status in results], elapsed, [status for latency, status in results])
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare catalog throughput and latency of the WSGI (sync views) and ASGI (async views) '
+        'handlers in-process, without a server or network in between.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', help='Endpoint to hit, may be repeated. Defaults to the catalog endpoints.')
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and handler.')
+        parser.add_argument('--cold', action='store_true', help='Bypass the snapshot cache on every request.')
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/products/', '/category/', '/heroSlider/']
+        self.stdout.write(f"{'handler':<8} {'path':<24} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+        for path in paths:
+            urls = request_urls(path, options['requests'], options['cold'])
+            for name, bench in (('wsgi', bench_wsgi), ('asgi', bench_asgi)):
+                result = bench(urls, options['concurrency'])
+                self.stdout.write(
+                    f"{name:<8} {path:<24} {result['req_per_sec']:>10.1f} {result['p50_ms']:>10.2f} "
+                    f"{result['p99_ms']:>10.2f} {result['errors']:>8}"
+                )
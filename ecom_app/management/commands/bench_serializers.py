@@ -0,0 +1,88 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from ecom_app.compiled_serializers import get_compiled_serializer
+from ecom_app.models import Customer, Categories, Product, Color, Size, ProductVariation, ProductOffer, Cart, Payment, Order
+from ecom_app.serializers import ProductSerializer, CartSerializer, OrderSerializer
+
+
+def create_fixtures(count):
+    # Bulk inserts skip the catalog signals, the rows are rolled back afterwards anyway
+    customer = Customer.objects.create_user(email='bench-serializers@example.com', password='bench')
+    color = Color.objects.create(color='bench-red')
+    size = Size.objects.create(size='bench-m')
+    category = Categories.objects.create(category_name='Bench', category_image='category/bench.jpg')
+    offer = ProductOffer.objects.create(offer='Bench offer')
+    products = Product.objects.bulk_create([
+        Product(sku=f'bench-{index}', product_name=f'Bench {index}', short_description='Short', full_description='Full',
+                list_image1=f'productlist/bench-{index}.jpg')
+        for index in range(count)
+    ])
+    Product.category.through.objects.bulk_create([
+        Product.category.through(product_id=product.id, categories_id=category.id) for product in products
+    ])
+    ProductOffer.products.through.objects.bulk_create([
+        ProductOffer.products.through(product_id=product.id, productoffer_id=offer.id) for product in products
+    ])
+    variations = ProductVariation.objects.bulk_create([
+        ProductVariation(product=product, color=color, size=size, original_price=100, discount_price=80, stock=10)
+        for product in products
+    ])
+    Cart.objects.bulk_create([Cart(customer=customer, product=variation) for variation in variations])
+    payments = Payment.objects.bulk_create([
+        Payment(customer=customer, amount=80, razorpay_payment_id=f'bench-{variation.id}') for variation in variations
+    ])
+    Order.objects.bulk_create([
+        Order(customer=customer, payment=payment, product_variation=variation, quantity=1, total_amount=80)
+        for payment, variation in zip(payments, variations)
+    ])
+    return customer
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare DRF model serializers with their compiled form on the product, cart and order lists. '
+        'Fixtures are created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        with transaction.atomic():
+            customer = create_fixtures(options['rows'])
+            cases = (
+                ('products', ProductSerializer, Product.objects.for_listing().filter(sku__startswith='bench-').order_by('id')),
+                ('cart', CartSerializer, Cart.objects.filter(customer=customer).order_by('id')),
+                ('orders', OrderSerializer, Order.objects.filter(customer=customer).select_related(
+                    'payment', 'product_variation__product', 'product_variation__color', 'product_variation__size',
+                ).order_by('order_id')),
+            )
+            self.stdout.write(f"{'list':<10} {'rows':>6} {'drf ms':>10} {'compiled ms':>12} {'speedup':>8}")
+            for name, serializer_class, queryset in cases:
+                compiled = get_compiled_serializer(serializer_class)
+                drf_time, drf_body = best_of(options['repeat'], lambda: renderer.render(
+                    serializer_class(queryset.all(), many=True).data
+                ))
+                compiled_time, compiled_body = best_of(options['repeat'], lambda: renderer.render(
+                    compiled.serialize(compiled.values(queryset.all()))
+                ))
+                if drf_body != compiled_body:
+                    self.stderr.write(self.style.ERROR(f'{name}: compiled output differs from {serializer_class.__name__}'))
+                self.stdout.write(
+                    f'{name:<10} {options["rows"]:>6} {drf_time * 1000:>10.1f} {compiled_time * 1000:>12.1f} '
+                    f'{drf_time / compiled_time:>7.1f}x'
+                )
+            transaction.set_rollback(True)
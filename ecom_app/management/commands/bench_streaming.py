@@ -0,0 +1,101 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from ecom_app.compiled_serializers import get_compiled_serializer
+from ecom_app.models import Categories, Product, Color, Size, ProductVariation
+from ecom_app.serializers import ProductSerializer
+from ecom_app.streaming import stream_rows
+
+SKU_PREFIX = 'bench-stream-'
+MODES = ('stream', 'compiled', 'drf')
+
+
+def create_fixtures(count, batch_size=2000):
+    color, _ = Color.objects.get_or_create(color='bench-red')
+    size, _ = Size.objects.get_or_create(size='bench-m')
+    category = Categories.objects.create(category_name='Bench', category_image='category/bench.jpg')
+    # Bulk inserts skip the catalog signals, nothing here needs facets or search.
+    # No offers, a shared offer would list every bench product in every row
+    for start in range(0, count, batch_size):
+        with transaction.atomic():
+            products = Product.objects.bulk_create([
+                Product(sku=f'{SKU_PREFIX}{index}', product_name=f'Bench {index}', short_description='Short',
+                        full_description='Full ' * 20, list_image1=f'productlist/bench-{index}.jpg')
+                for index in range(start, min(start + batch_size, count))
+            ])
+            Product.category.through.objects.bulk_create([
+                Product.category.through(product_id=product.id, categories_id=category.id) for product in products
+            ])
+            ProductVariation.objects.bulk_create([
+                ProductVariation(product=product, color=color, size=size, original_price=100, discount_price=80, stock=10)
+                for product in products
+            ])
+    return category
+
+
+def render(mode):
+    queryset = Product.objects.for_listing().filter(sku__startswith=SKU_PREFIX).order_by('id')
+    if mode == 'drf':
+        yield JSONRenderer().render({'results': ProductSerializer(queryset, many=True).data})
+    elif mode == 'compiled':
+        compiled = get_compiled_serializer(ProductSerializer)
+        yield JSONRenderer().render({'results': compiled.serialize(compiled.values(queryset))})
+    else:
+        yield from stream_rows({}, 'results', queryset, ('id',), ProductSerializer)
+
+
+def measure(mode):
+    # ru_maxrss only grows, so each mode runs in a fresh process
+    Product.objects.filter(sku__startswith=SKU_PREFIX)[:1].exists()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in render(mode))
+    return {
+        'seconds': time.perf_counter() - started,
+        'bytes': size,
+        'baseline_rss_kb': baseline,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare peak RSS of rendering the whole product list with DRF serializers, compiled serializers '
+        'and the streaming renderer. Creates bench products, measures each mode in a subprocess, '
+        'then deletes them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--measure', choices=MODES, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['measure']:
+            self.stdout.write(json.dumps(measure(options['measure'])))
+            return
+
+        self.stdout.write(f"Creating {options['rows']} bench products...")
+        category = create_fixtures(options['rows'])
+        try:
+            self.stdout.write(f"{'mode':<10} {'seconds':>8} {'MB out':>8} {'peak RSS MB':>12} {'growth MB':>10}")
+            for mode in MODES:
+                result = subprocess.run(
+                    [sys.executable, '-m', 'django', 'bench_streaming', '--measure', mode],
+                    cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+                )
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                self.stdout.write(
+                    f"{mode:<10} {stats['seconds']:>8.2f} {stats['bytes'] / 2 ** 20:>8.1f} "
+                    f"{stats['peak_rss_kb'] / 1024:>12.1f} {(stats['peak_rss_kb'] - stats['baseline_rss_kb']) / 1024:>10.1f}"
+                )
+        finally:
+            with transaction.atomic():
+                Product.objects.filter(sku__startswith=SKU_PREFIX).delete()
+                category.delete()
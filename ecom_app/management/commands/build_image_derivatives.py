@@ -0,0 +1,67 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from PIL import Image
+from ecom_app.checks import process_local_snapshots
+from ecom_app.images import IMAGE_FIELDS, build_derivatives, srcset_field, store_srcset
+
+
+def derive(name):
+    # Runs in a pool process, which reads and writes media only, never the database
+    try:
+        return name, build_derivatives(name), None
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return name, {'source': name}, repr(e)
+
+
+def stale_images(model, field_name, force, chunk_size=2000):
+    # {image name: [pks]} of rows whose srcset was built from another image, or is still pending
+    stale = defaultdict(list)
+    rows = model._default_manager.exclude(Q(**{field_name: ''}) | Q(**{f'{field_name}__isnull': True}))
+    for pk, name, srcset in rows.values_list('pk', field_name, srcset_field(field_name)).iterator(chunk_size=chunk_size):
+        srcset = srcset or {}
+        if force or srcset.get('source') != name or srcset.get('pending'):
+            stale[name].append(pk)
+    return stale
+
+
+class Command(BaseCommand):
+    help = (
+        'Build resized and WebP copies of existing catalog images in a process pool and store their srcsets. '
+        'Images whose srcset is current are skipped, unless --force is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count())
+        parser.add_argument('--force', action='store_true', help='Rebuild every srcset, including failed ones.')
+
+    def handle(self, *args, **options):
+        if process_local_snapshots():
+            raise CommandError(
+                'CATALOG_SNAPSHOT keeps snapshots in process memory, the web workers would never see '
+                'the new srcsets. Use a shared snapshot backend.'
+            )
+        built = failed = 0
+        with ProcessPoolExecutor(max_workers=options['processes'], initializer=django.setup) as pool:
+            for label, field_names in IMAGE_FIELDS.items():
+                model = apps.get_model(label)
+                for field_name in field_names:
+                    stale = stale_images(model, field_name, options['force'])
+                    if not stale:
+                        continue
+                    self.stdout.write(f'{label}.{field_name}: {len(stale)} images')
+                    # Each distinct image is decoded once, however many rows share it
+                    futures = [pool.submit(derive, name) for name in stale]
+                    for future in as_completed(futures):
+                        name, srcset, error = future.result()
+                        if error:
+                            failed += 1
+                            self.stderr.write(f'  {name}: {error}')
+                        else:
+                            built += 1
+                        store_srcset(model, field_name, name, srcset, stale[name])
+        self.stdout.write(self.style.SUCCESS(f'Built derivatives of {built} images, {failed} failed.'))
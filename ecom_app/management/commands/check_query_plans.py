@@ -0,0 +1,68 @@
+import re
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Value
+from ecom_app.models import Cart, Order, Payment, Product, ProductImage
+from ecom_app.pagination import OrderCursorPagination
+
+
+def hot_queries():
+    # Placeholder values, the plan depends on the shape of the lookup, not the value
+    return {
+        'cart line': Cart.objects.filter(customer_id=1, product_id=1),
+        'cart': Cart.objects.filter(customer_id=1),
+        'order history': Order.objects.filter(customer_id=1).order_by(*OrderCursorPagination.ordering)[:20],
+        'product images by color': ProductImage.objects.filter(product_id=1, color_id=1),
+        # Compared to a value, new=True is a bare column on SQLite, which no index serves
+        'new products': Product.objects.filter(new=Value(True)).order_by('id')[:20],
+        'featured products': Product.objects.filter(featured=Value(True)).order_by('id')[:20],
+        'payment lookup': Payment.objects.filter(razorpay_payment_id='pay_0', customer_id=1),
+        'admin orders by status': Order.objects.filter(order_status='Shipped').order_by('-order_id')[:100],
+        'admin orders by date': Order.objects.filter(
+            order_date__gte=datetime(2026, 1, 1, tzinfo=timezone.utc),
+            order_date__lt=datetime(2026, 1, 8, tzinfo=timezone.utc),
+        ).order_by('-order_id')[:100],
+    }
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    # Table scans in each backend's EXPLAIN dialect
+    if connection.vendor == 'sqlite':
+        # SCAN <table>, SCAN TABLE <table> on older SQLite, or a walk over a whole index
+        return [row['detail'] for row in plan if re.match(r'SCAN ', row['detail'])]
+    if connection.vendor == 'mysql':
+        return [f"{row['table']} (type ALL)" for row in plan if row['type'] == 'ALL']
+    if connection.vendor == 'postgresql':
+        return [row['QUERY PLAN'].strip() for row in plan if 'Seq Scan' in row['QUERY PLAN']]
+    raise CommandError(f'No plan checks for the {connection.vendor} backend.')
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot lookup queries and fail if any of them scans a whole table.'
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, queryset in hot_queries().items():
+            plan = explain(queryset)
+            scans = full_scans(plan)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: full scan of {", ".join(scans)}'))
+            else:
+                self.stdout.write(f'{name}: ok')
+            if options['verbosity'] > 1:
+                for row in plan:
+                    self.stdout.write(f'    {row}')
+        if failures:
+            raise CommandError(f'Full table scans in: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('No full table scans in the hot queries.'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ecom_app.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index, e.g. after bulk imports.'
+
+    def handle(self, *args, **options):
+        get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS('Product search index rebuilt.'))
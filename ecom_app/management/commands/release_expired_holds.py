@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from ecom_app.holds import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Release expired cart stock holds in chunks, once or every --interval seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--interval', type=float, help='Keep sweeping, this many seconds apart.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            released = release_expired_holds(options['chunk_size'])
+            self.stdout.write(f'Released {released} expired holds in {time.monotonic() - started:.2f}s.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+            close_old_connections()
@@ -0,0 +1,103 @@
+import multiprocessing
+import signal
+import time
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from ecom_app.checks import process_local_snapshots
+from ecom_app.jobs import DONE, FAILED, RETRIED, queue_metrics, requeue_stale_jobs, work, worker_name
+
+
+def worker_process(index, stop, counters, burst):
+    # Ctrl-C reaches the whole process group, the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Needed under the spawn start method, a no-op for forked workers
+    django.setup()
+    work(worker_name(index), stop, counters, burst)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued jobs in N worker processes until stopped, printing throughput and queue metrics. '
+        'With --concurrency 1 jobs run in this process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due.')
+        parser.add_argument('--metrics-interval', type=float, default=10.0, help='Seconds between metrics lines.')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        # Jobs change the catalog outside the web workers, e.g. image srcsets
+        if process_local_snapshots():
+            raise CommandError(
+                'CATALOG_SNAPSHOT keeps snapshots in process memory, the web workers would never see '
+                'the catalog changes jobs make. Use a shared snapshot backend.'
+            )
+        context = multiprocessing.get_context()
+        self.stop = context.Event()
+        self.counters = {outcome: context.Value('q', 0) for outcome in (DONE, RETRIED, FAILED)}
+        self.last_report = time.monotonic()
+        self.last_counts = self.counts()
+        self.interval = options['metrics_interval']
+        previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: self.stop.set())
+
+        started = time.monotonic()
+        try:
+            requeue_stale_jobs()
+            if options['concurrency'] == 1:
+                work(worker_name(), self.stop, self.counters, options['burst'], report=self.report)
+            else:
+                self.run_processes(context, options['concurrency'], options['burst'])
+        except KeyboardInterrupt:
+            self.stop.set()
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+            self.report(force=True)
+
+        counts = self.counts()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {sum(counts.values())} jobs in {elapsed:.1f}s, {counts[DONE] / elapsed:.1f} done/s: '
+            f'{counts[DONE]} done, {counts[RETRIED]} retried, {counts[FAILED]} failed.'
+        ))
+
+    def run_processes(self, context, concurrency, burst):
+        # Forked workers must not share the parent's database sockets
+        connections.close_all()
+        processes = [
+            context.Process(target=worker_process, args=(index, self.stop, self.counters, burst), daemon=True)
+            for index in range(concurrency)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            while any(process.is_alive() for process in processes):
+                for process in processes:
+                    process.join(timeout=min(self.interval, 1.0) / concurrency)
+                self.report()
+        finally:
+            self.stop.set()
+            for process in processes:
+                process.join()
+
+    def counts(self):
+        return {outcome: counter.value for outcome, counter in self.counters.items()}
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        counts = self.counts()
+        rate = (counts[DONE] - self.last_counts[DONE]) / max(now - self.last_report, 1e-9)
+        self.last_report, self.last_counts = now, counts
+        requeued = requeue_stale_jobs()
+        metrics = queue_metrics()
+        self.stdout.write(
+            f"{rate:.1f} done/s | done {counts[DONE]} retried {counts[RETRIED]} failed {counts[FAILED]} | "
+            f"queued {metrics['queued']} (due {metrics['due']}, lag {metrics['lag_seconds']:.1f}s) "
+            f"running {metrics['running']} failed {metrics['failed']}"
+            + (f' | requeued {requeued} stale' if requeued else '')
+        )
@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+from ecom_app.models import Customer, Categories, Product, Color, Size, ProductVariation, Payment, Order
+from ecom_app.views import CreateOrderView
+
+
+def run_checkout_stress(threads=8, attempts=25, stock=100, quantity=1, retries=50):
+    # Fire concurrent /order/ requests at one variation and check nothing was oversold
+    run_id = uuid.uuid4().hex[:12]
+    color, _ = Color.objects.get_or_create(color='stress-test')
+    size, _ = Size.objects.get_or_create(size='stress-test')
+    category = Categories.objects.create(category_name=f'stress-{run_id}', category_image='category/stress.jpg')
+    product = Product.objects.create(
+        sku=f'stress-{run_id}', product_name='Stress test', short_description='', full_description=''
+    )
+    product.category.add(category)
+    variation = ProductVariation.objects.create(
+        product=product, color=color, size=size, original_price=10, discount_price=10, stock=stock
+    )
+    customers = [
+        Customer.objects.create_user(email=f'stress-{run_id}-{index}@example.com', password=None)
+        for index in range(threads)
+    ]
+    # One payment per attempt, an order is rejected as a duplicate if it reuses one
+    Payment.objects.bulk_create([
+        Payment(customer=customer, amount=10 * quantity, razorpay_payment_id=f'stress-{run_id}-{index}-{attempt}')
+        for index, customer in enumerate(customers)
+        for attempt in range(attempts)
+    ])
+
+    results = {'placed': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    view = CreateOrderView.as_view()
+    factory = APIRequestFactory()
+
+    def place_order(customer, data):
+        # SQLite refuses a write while another transaction holds the lock, rather than
+        # queueing it. The order transaction rolled back, so it is retried, like a client would
+        for retry in range(retries + 1):
+            request = factory.post('/order/', data, format='json')
+            force_authenticate(request, user=customer)
+            try:
+                response = view(request)
+            except OperationalError:
+                time.sleep(random.uniform(0, 0.01 * 2 ** min(retry, 5)))
+                continue
+            return 'placed' if response.status_code == 201 else 'rejected'
+        return 'errors'
+
+    def worker(index, customer):
+        start.wait()
+        try:
+            for attempt in range(attempts):
+                outcome = place_order(customer, {
+                    'payment_id': f'stress-{run_id}-{index}-{attempt}',
+                    'product_variation_id': variation.id,
+                    'quantity': quantity,
+                })
+                with lock:
+                    results[outcome] += 1
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker, args=(index, customer)) for index, customer in enumerate(customers)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    variation.refresh_from_db()
+    ordered = sum(Order.objects.filter(product_variation=variation).values_list('quantity', flat=True))
+    results.update({
+        'initial_stock': stock,
+        'final_stock': variation.stock,
+        'ordered': ordered,
+        'oversold': max(0, ordered - stock) + max(0, -variation.stock),
+        'lost_updates': stock - ordered - variation.stock,
+        # Orders committed but reported as failed, or reported but never committed
+        'misreported': ordered - results['placed'] * quantity,
+        'seconds': elapsed,
+        'orders_per_second': results['placed'] / elapsed if elapsed else 0.0,
+    })
+
+    Order.objects.filter(product_variation=variation).delete()
+    Customer.objects.filter(id__in=[customer.id for customer in customers]).delete()
+    product.delete()
+    category.delete()
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Place concurrent orders against one variation and report oversell and orders/sec.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=25, help='Orders attempted per thread.')
+        parser.add_argument('--stock', type=int, default=100)
+
+    def handle(self, *args, **options):
+        results = run_checkout_stress(options['threads'], options['attempts'], options['stock'])
+        for key, value in results.items():
+            self.stdout.write(f'{key}: {value:.2f}' if isinstance(value, float) else f'{key}: {value}')
+        if results['oversold'] or results['lost_updates']:
+            raise CommandError('Stock was oversold.')
+        if results['errors'] or results['misreported']:
+            raise CommandError('Orders failed or were misreported, the run did not test contention.')
+        self.stdout.write(self.style.SUCCESS('No oversell.'))
@@ -0,0 +1,131 @@
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Create your media serving here.
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# A year, the longest max-age caches are asked to honour
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def cache_control(path):
+    # Derivatives are named by their content, a changed image gets a new name
+    if path.startswith(settings.IMAGE_DERIVATIVES['PATH'] + '/'):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f"public, max-age={settings.MEDIA_SERVING['MAX_AGE']}"
+
+
+def parse_range(header, size):
+    # (start, end inclusive) of a single byte range, None to send the whole file
+    # and ValueError when no byte of the range is in the file
+    match = RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        # Multiple ranges or another unit, sending everything is allowed
+        return None
+    first, last = match.groups()
+    if not first:
+        # The last n bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+# Bounded File
+# Reads a file up to a byte offset, for ranges that end before the end of the file
+class BoundedFile:
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def guess_content_type(full_path):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    return content_type or 'application/octet-stream'
+
+
+def offload_response(path, full_path):
+    # The front proxy sends the file and answers Range, Django only checks it and sets the headers
+    response = HttpResponse(content_type=guess_content_type(full_path))
+    if settings.MEDIA_SERVING['MODE'] == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_SERVING['ACCEL_PREFIX'] + quote(path)
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def file_response(request, full_path, file_stat):
+    content_type = guess_content_type(full_path)
+    size = file_stat.st_size
+    byte_range = None
+    if 'Range' in request.headers and (
+        # A stale If-Range asks for the whole, changed file
+        'If-Range' not in request.headers
+        or parse_http_date_safe(request.headers['If-Range']) == int(file_stat.st_mtime)
+    ):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        # FileResponse hands real files to wsgi.file_wrapper, i.e. sendfile() under gunicorn
+        return FileResponse(file, content_type=content_type)
+
+    start, end = byte_range
+    file.seek(start)
+    # A range to the end of the file stays a real file, so it can still use sendfile()
+    response = FileResponse(
+        file if end == size - 1 else BoundedFile(file, end - start + 1), content_type=content_type, status=206
+    )
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('No such media file.')
+    if not S_ISREG(file_stat.st_mode):
+        raise Http404('No such media file.')
+
+    modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if modified_since is not None and int(file_stat.st_mtime) <= modified_since:
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_SERVING['MODE'] == 'sendfile':
+        response = file_response(request, full_path, file_stat)
+    else:
+        response = offload_response(path, full_path)
+    response['Last-Modified'] = http_date(file_stat.st_mtime)
+    response['Cache-Control'] = cache_control(path)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,64 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+from .routers import current_request
+
+# Create your middleware here.
+
+def is_stateless_request(request):
+    return not request.path_info.startswith(tuple(settings.STATEFUL_PATH_PREFIXES))
+
+
+# Skips the wrapped middleware for token-authenticated API routes
+class StatelessApiMixin:
+    def __call__(self, request):
+        if is_stateless_request(request):
+            # In async mode this hands back the next coroutine for the handler to await
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+# Session Middleware
+class ApiSessionMiddleware(StatelessApiMixin, SessionMiddleware):
+    pass
+
+
+# CSRF Middleware
+class ApiCsrfViewMiddleware(StatelessApiMixin, CsrfViewMiddleware):
+    pass
+
+
+# Authentication Middleware
+class ApiAuthenticationMiddleware(StatelessApiMixin, AuthenticationMiddleware):
+    pass
+
+
+# Message Middleware
+class ApiMessageMiddleware(StatelessApiMixin, MessageMiddleware):
+    pass
+
+
+# Replica Pin Middleware
+# Exposes the request to ReplicaRouter, which pins the user to the primary on writes
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Same as MiddlewareMixin, no sync/async adapter around this middleware under ASGI
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with current_request(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with current_request(request):
+            return await self.get_response(request)
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# The DDL is copied here rather than imported from ecom_app.search, so this
+# migration keeps building the index it always built whatever that module becomes
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE ecom_app_product_fts USING fts5("
+    "product_name, sku, short_description, full_description, tokenize='unicode61')",
+    "INSERT INTO ecom_app_product_fts (rowid, product_name, sku, short_description, full_description) "
+    "SELECT id, product_name, sku, short_description, full_description FROM ecom_app_product",
+]
+SQLITE_DROP = ['DROP TABLE IF EXISTS ecom_app_product_fts']
+
+MYSQL_CREATE = [
+    'ALTER TABLE ecom_app_product ADD FULLTEXT INDEX ecom_app_product_fulltext '
+    '(product_name, sku, short_description, full_description)',
+]
+MYSQL_DROP = ['ALTER TABLE ecom_app_product DROP INDEX ecom_app_product_fulltext']
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecom_app', '0018_payment_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_CREATE, 'mysql': MYSQL_CREATE}),
+            run({'sqlite': SQLITE_DROP, 'mysql': MYSQL_DROP}),
+        ),
+    ]
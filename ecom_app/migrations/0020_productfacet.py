@@ -0,0 +1,56 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_facets(apps, schema_editor):
+    ProductVariation = apps.get_model('ecom_app', 'ProductVariation')
+    ProductFacet = apps.get_model('ecom_app', 'ProductFacet')
+    Product = apps.get_model('ecom_app', 'Product')
+
+    categories = {}
+    for product_id, category_id in Product.category.through.objects.values_list('product_id', 'categories_id'):
+        categories.setdefault(product_id, []).append(category_id)
+
+    rows = []
+    for variation in ProductVariation.objects.select_related('product').iterator(chunk_size=2000):
+        for category_id in categories.get(variation.product_id) or [None]:
+            rows.append(ProductFacet(
+                product_id=variation.product_id,
+                variation_id=variation.id,
+                category_id=category_id,
+                color_id=variation.color_id,
+                size_id=variation.size_id,
+                price=variation.discount_price if variation.discount_price is not None else variation.original_price,
+                in_stock=variation.stock > 0,
+                new=variation.product.new,
+                featured=variation.product.featured,
+            ))
+    ProductFacet.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecom_app', '0019_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('in_stock', models.BooleanField(default=False)),
+                ('new', models.BooleanField(default=False)),
+                ('featured', models.BooleanField(default=False)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='ecom_app.categories')),
+                ('color', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ecom_app.color')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ecom_app.product')),
+                ('size', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ecom_app.size')),
+                ('variation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ecom_app.productvariation')),
+            ],
+        ),
+        migrations.RunPython(populate_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.7 on 2026-10-18 16:58
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_lines(apps, schema_editor):
+    # Racing get_or_create calls may have left several lines for one variation,
+    # fold them into the oldest line before the unique constraint goes on
+    Cart = apps.get_model('ecom_app', 'Cart')
+    duplicates = (
+        Cart.objects.filter(product__isnull=False)
+        .values('customer_id', 'product_id')
+        .annotate(lines=Count('id'), keep_id=Min('id'), total=Sum('quantity'))
+        .filter(lines__gt=1)
+    )
+    for duplicate in duplicates:
+        lines = Cart.objects.filter(customer_id=duplicate['customer_id'], product_id=duplicate['product_id'])
+        lines.exclude(id=duplicate['keep_id']).delete()
+        lines.filter(id=duplicate['keep_id']).update(quantity=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecom_app', '0020_productfacet'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-order_date', '-order_id'], name='order_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('new', True)), fields=['id'], name='product_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('featured', True)), fields=['id'], name='product_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productimage',
+            index=models.Index(fields=['product', 'color'], name='productimage_product_color_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_cart_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('customer', 'product'), name='unique_customer_cart_product'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecom_app', '0024_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariation',
+            name='held',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('variation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ecom_app.productvariation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at', 'id'], name='stockhold_expiry_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockhold',
+            constraint=models.UniqueConstraint(fields=('customer', 'variation'), name='unique_customer_stock_hold'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecom_app', '0025_stock_holds'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['new', 'id'], name='product_new_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['featured', 'id'], name='product_featured_id_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:51
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecom_app', '0026_product_flag_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_new_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_featured_idx',
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
@@ -55,11 +56,36 @@ class Customer(AbstractUser):
 class Categories(models.Model):
     category_name = models.CharField(max_length=191)
     category_image = models.ImageField(upload_to='category/', max_length=191)
+    category_image_srcset = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.category_name
     
 
+# Product QuerySet
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        # Load everything ProductSerializer touches in a fixed number of queries.
+        # Related rows are ordered by id, as the compiled serializers read them
+        return self.prefetch_related(
+            models.Prefetch('category', queryset=Categories.objects.order_by('id')),
+            models.Prefetch(
+                'offers',
+                queryset=ProductOffer.objects.order_by('id').prefetch_related(
+                    models.Prefetch('products', queryset=Product.objects.only('id').order_by('id'))
+                ),
+            ),
+            models.Prefetch(
+                'productvariation_set',
+                queryset=ProductVariation.objects.select_related('color', 'size').order_by('id'),
+            ),
+            models.Prefetch(
+                'product_images',
+                queryset=ProductImage.objects.order_by('id'),
+            ),
+        )
+
+
 # Product Model
 class Product(models.Model):
     sku = models.CharField(max_length=191, unique=True)
@@ -72,6 +98,20 @@ class Product(models.Model):
     replacement = models.TextField(null=True)
     list_image1 = models.ImageField(upload_to='productlist/', max_length=191, null=True, blank=True)
     list_image2 = models.ImageField(upload_to='productlist/', max_length=191, null=True, blank=True)
+    # Resized and WebP copies of the list images, see ecom_app/images.py
+    list_image1_srcset = models.JSONField(default=dict, blank=True, editable=False)
+    list_image2_srcset = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        # The flagged products read in keyset order. Not partial, MySQL has no partial
+        # indexes and would build them as duplicates of these. SQLite only uses them
+        # for a comparison, filter(new=Value(True)), not the bare column of new=True
+        indexes = [
+            models.Index(fields=['new', 'id'], name='product_new_id_idx'),
+            models.Index(fields=['featured', 'id'], name='product_featured_id_idx'),
+        ]
 
     def __str__(self):
         return self.product_name
@@ -93,6 +133,35 @@ class Size(models.Model):
         return self.size
 
 
+# Product Variation QuerySet
+class ProductVariationQuerySet(models.QuerySet):
+    def held_stock_change(self, changes):
+        return models.Case(
+            *[models.When(id=variation_id, then=change) for variation_id, change in changes.items()],
+            output_field=models.IntegerField(),
+        )
+
+    def change_held_stock(self, changes):
+        # {variation id: change} to held stock in one UPDATE for any number of variations.
+        # False when a rise is short of available stock, the caller then rolls back
+        if not changes:
+            return True
+        rises = [variation_id for variation_id, change in changes.items() if change > 0]
+        return self.filter(
+            models.Q(id__in=rises, stock__gte=models.F('held') + self.held_stock_change(changes))
+            | models.Q(id__in=[variation_id for variation_id in changes if variation_id not in rises])
+        ).update(held=models.F('held') + self.held_stock_change(changes)) == len(changes)
+
+    def convert_held_stock(self, variation_id, quantity, held):
+        # Sells quantity, of which held units come out of the customer's hold and the
+        # rest out of available stock. Conditional UPDATE, so concurrent orders can never
+        # take stock below zero or sell what other carts hold
+        return self.filter(id=variation_id, stock__gte=models.F('held') - held + quantity).update(
+            stock=models.F('stock') - quantity,
+            held=models.F('held') - held,
+        ) == 1
+
+
 # Product Variation Model
 class ProductVariation(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -101,21 +170,53 @@ class ProductVariation(models.Model):
     original_price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_price = models.DecimalField(null=True, max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
+    # Units in cart holds, see StockHold. Available stock is stock - held
+    held = models.IntegerField(default=0)
+
+    objects = ProductVariationQuerySet.as_manager()
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['product', 'color', 'size'], name='unique_product_color_size')
         ]
 
+    @property
+    def effective_price(self):
+        # The price a line sells at, as CartQuerySet.with_prices() works it out in SQL
+        return self.discount_price if self.discount_price is not None else self.original_price
+
     def __str__(self):
         return f'{self.product.product_name} - {self.color.color} - {self.size.size}'
 
 
+# Product Facet Model
+# One row per variation and category, maintained from signals, so facet counts never join
+class ProductFacet(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE)
+    category = models.ForeignKey(Categories, on_delete=models.CASCADE, null=True)
+    color = models.ForeignKey(Color, on_delete=models.CASCADE)
+    size = models.ForeignKey(Size, on_delete=models.CASCADE)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    in_stock = models.BooleanField(default=False)
+    new = models.BooleanField(default=False)
+    featured = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'Facet of variation {self.variation_id} in category {self.category_id}'
+
+
 # Product Image Model
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name='product_images', on_delete=models.CASCADE)
     color = models.ForeignKey(Color, related_name='color_images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='products/', max_length=191)
+    image_srcset = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'color'], name='productimage_product_color_idx'),
+        ]
 
     def __str__(self):
         return f'{self.product.product_name} - {self.color.color} Image'
@@ -131,6 +232,46 @@ class ProductOffer(models.Model):
         return self.offer
 
 
+# Cart QuerySet
+class CartQuerySet(models.QuerySet):
+    def with_prices(self):
+        # The discount price where there is one, else the original price
+        price = Coalesce('product__discount_price', 'product__original_price')
+        money = models.DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            effective_price=price,
+            line_total=models.ExpressionWrapper(price * models.F('quantity'), output_field=money),
+            line_discount=models.ExpressionWrapper(
+                (models.F('product__original_price') - price) * models.F('quantity'), output_field=money
+            ),
+        )
+
+    def with_stock(self):
+        # Changes with every customer's holds, not only this cart's
+        return self.annotate(
+            held=Coalesce(models.Subquery(
+                StockHold.objects.filter(
+                    customer=models.OuterRef('customer'), variation=models.OuterRef('product')
+                ).values('quantity')[:1]
+            ), 0),
+            available_stock=models.F('product__stock') - models.F('product__held'),
+            # The line's own hold plus what nobody holds covers it
+            in_stock=models.ExpressionWrapper(
+                models.Q(quantity__lte=models.F('held') + models.F('product__stock') - models.F('product__held')),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+    def with_totals(self):
+        # Cart totals on every line as window aggregates, lines and totals in one query
+        return self.filter(product__isnull=False).with_prices().annotate(
+            line_count=models.Window(models.Count('id')),
+            item_count=models.Window(models.Sum('quantity')),
+            subtotal=models.Window(models.Sum('line_total')),
+            discount=models.Window(models.Sum('line_discount')),
+        )
+
+
 # Cart Item Model
 class Cart(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
@@ -138,15 +279,44 @@ class Cart(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'product'], name='unique_customer_cart_product')
+        ]
+
     def __str__(self):
         return f'{self.quantity} of {self.product} for {self.customer}'
     
 
+# Stock Hold Model
+# Stock set aside for a cart line until expires_at. Adding to cart holds stock,
+# checkout sells it and a sweep on the job queue gives it back once expired
+class StockHold(models.Model):
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'variation'], name='unique_customer_stock_hold')
+        ]
+        indexes = [
+            models.Index(fields=['expires_at', 'id'], name='stockhold_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} of {self.variation_id} held for {self.customer_id}'
+
+
 # Hero Slider Model
 class HeroSlider(models.Model):
     title = models.CharField(max_length=191)
     description = models.CharField(max_length=191)
     image = models.ImageField(upload_to='heroSlider/', max_length=191)
+    image_srcset = models.JSONField(default=dict, blank=True, editable=False)
     url = models.CharField(max_length=191)
     bg = models.CharField(max_length=191)
 
@@ -158,6 +328,7 @@ class HeroSlider(models.Model):
 class CategorySlider(models.Model):
     title = models.CharField(max_length=191)
     image = models.ImageField(upload_to='categorySlider/', max_length=191)
+    image_srcset = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.title
@@ -191,6 +362,16 @@ class Payment(models.Model):
         return f'Payment {self.razorpay_payment_id} for {self.customer.first_name}'
 
 
+# Order QuerySet
+class OrderQuerySet(models.QuerySet):
+    def transition_status(self, order_status):
+        # One UPDATE for any number of orders, skipping those already in the status
+        return self.exclude(order_status=order_status).update(
+            order_status=order_status,
+            order_status_date=timezone.now(),
+        )
+
+
 # Order Model
 class Order(models.Model):
     order_id = models.AutoField(primary_key=True)
@@ -212,13 +393,75 @@ class Order(models.Model):
     order_date = models.DateTimeField(default=timezone.now)
     order_status_date = models.DateTimeField(auto_now_add=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        # Matches the order history ordering, so a customer's page is an index range read.
+        # The status and date indexes back the admin changelist filters
+        indexes = [
+            models.Index(fields=['customer', '-order_date', '-order_id'], name='order_customer_date_idx'),
+            models.Index(fields=['order_status', '-order_id'], name='order_status_idx'),
+            models.Index(fields=['order_date'], name='order_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded status so save() can spot a change without a query
+        instance._loaded_order_status = instance.__dict__.get('order_status')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # The reloaded status is the one save() compares against from now on
+        if fields is None or 'order_status' in fields:
+            self._loaded_order_status = self.__dict__.get('order_status')
+
     def save(self, *args, **kwargs):
         # Update order_status_date if order_status is changed
-        if self.pk is not None:  # Check if the instance already exists
-            original = Order.objects.get(pk=self.pk)
-            if original.order_status != self.order_status:
+        if not self._state.adding:
+            original_status = getattr(self, '_loaded_order_status', None)
+            if original_status is None:
+                original_status = Order.objects.filter(pk=self.pk).values_list('order_status', flat=True).first()
+            if original_status != self.order_status:
                 self.order_status_date = timezone.now()
+                update_fields = kwargs.get('update_fields')
+                if update_fields is not None and 'order_status_date' not in update_fields:
+                    kwargs['update_fields'] = [*update_fields, 'order_status_date']
         super(Order, self).save(*args, **kwargs)
+        self._loaded_order_status = self.order_status
+
+    def __str__(self):
+        return f'Order {self.order_id} by {self.customer.email}'
+
+# Job Model
+# Deferred work, run by manage.py run_workers, see ecom_app/jobs.py.
+# Finished jobs are deleted, failed ones stay for inspection
+class Job(models.Model):
+    name = models.CharField(max_length=191)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('Queued', 'Queued'),
+            ('Running', 'Running'),
+            ('Failed', 'Failed'),
+        ],
+        default='Queued'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Workers claim due jobs oldest first, an index range read however long the queue
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='job_claim_idx'),
+        ]
 
     def __str__(self):
-        return f'Order {self.order_id} by {self.customer.email}'
\ No newline at end of file
+        return f'{self.name} ({self.status})'
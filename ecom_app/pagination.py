@@ -0,0 +1,59 @@
+import json
+from base64 import b64decode, b64encode
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+# Create your paginations here.
+
+# Base Cursor Pagination
+# DRF's cursor holds the first ordering field of the last row, plus an offset past
+# the rows that share it. Later ordering fields only make the order of ties stable,
+# they are not part of the seek, so a long run of equal values costs an offset scan.
+class KeysetPagination(CursorPagination):
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+# Product Pagination
+class ProductCursorPagination(KeysetPagination):
+    ordering = 'id'
+
+
+# Order Pagination
+# Seeks on order_date, orders placed in the same microsecond are stepped over by offset
+class OrderCursorPagination(KeysetPagination):
+    ordering = ('-order_date', '-order_id')
+
+
+# Search Result Pagination
+# Keyset over (score, id) for ranked results that are not a plain queryset
+class ScoreCursorPagination:
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = settings.API_PAGE_SIZE
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            score, pk = json.loads(b64decode(encoded.encode('ascii')).decode('ascii'))
+            return float(score), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self, request, score, pk):
+        encoded = b64encode(json.dumps([score, pk]).encode('ascii')).decode('ascii')
+        return replace_query_param(request.build_absolute_uri(), self.cursor_query_param, encoded)
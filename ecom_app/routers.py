@@ -0,0 +1,109 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+# Create your database routers here.
+
+_current_request = ContextVar('current_request', default=None)
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASE_REPLICAS['ALIASES'] if alias in settings.DATABASES]
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    config = settings.DATABASE_REPLICAS
+    caches[config['PIN_CACHE']].set(pin_key(user_id), True, config['PIN_SECONDS'])
+
+
+def is_pinned_to_primary(user_id):
+    return caches[settings.DATABASE_REPLICAS['PIN_CACHE']].get(pin_key(user_id), False)
+
+
+@contextmanager
+def replica_reads():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    # For reads that outlive the request, e.g. a snapshot cached under the
+    # newest table version must not be rendered from a lagging replica
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def current_request(request):
+    token = _current_request.set(request)
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
+
+
+# Replica Router
+# Reads go to a replica only inside replica_reads(), i.e. the order views and
+# exports. Catalog views send validators taken from the primary, so they read from
+# it too. Writes to the user's own data pin their reads to the primary for a few
+# seconds, so they never read their own write from a lagging replica.
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return None
+        # Reads inside a transaction must see its writes
+        if connections['default'].in_atomic_block:
+            return None
+        aliases = replica_aliases()
+        return random.choice(aliases) if aliases else None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label in settings.DATABASE_REPLICAS['PIN_MODELS']:
+            request = _current_request.get()
+            # DRF sets the authenticated user on the underlying request too
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {'default', *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# Replica Read Mixin
+# Safe requests read from a replica unless the user wrote recently
+class ReplicaReadMixin:
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.reads_from_replica = request.method in SAFE_METHODS and not (
+            request.user.is_authenticated and is_pinned_to_primary(request.user.pk)
+        )
+        if self.reads_from_replica:
+            self._replica_reads_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_reads_token', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_reads_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
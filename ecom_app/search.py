@@ -0,0 +1,149 @@
+import re
+from functools import reduce
+from operator import and_, or_
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from .models import Product
+
+# Create your product search here.
+
+SEARCH_FIELDS = ('product_name', 'sku', 'short_description', 'full_description')
+SQLITE_TABLE = 'ecom_app_product_fts'
+MYSQL_INDEX = 'ecom_app_product_fulltext'
+SEARCH_VENDORS = ('sqlite', 'mysql')
+
+
+def tokenize(query):
+    return re.findall(r'\w+', query.lower())
+
+
+# SQLite FTS5 Search Backend
+# The FTS table is created by migration 0019 and kept in sync from signals
+class SQLiteProductSearch:
+    # bm25 weights, in SEARCH_FIELDS order
+    weights = (10.0, 8.0, 2.0, 1.0)
+    populate_sql = (
+        f"INSERT INTO {SQLITE_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) "
+        f"SELECT id, {', '.join(SEARCH_FIELDS)} FROM ecom_app_product"
+    )
+
+    @property
+    def score(self):
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return f'-bm25({SQLITE_TABLE}, {weights})'
+
+    def index_product(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [product.pk])
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (%s, %s, %s, %s, %s)",
+                [product.pk] + [getattr(product, field) for field in SEARCH_FIELDS],
+            )
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [product_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+            cursor.execute(self.populate_sql)
+
+    def search(self, query, limit, after=None):
+        # Every term must match, the last one as a prefix so partial words still hit
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"' for term in terms[:-1])
+        match = f'{match} "{terms[-1]}"*'.strip()
+
+        sql = f'SELECT rowid, {self.score} AS score FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s'
+        params = [match]
+        if after is not None:
+            sql += f' AND ({self.score} < %s OR ({self.score} = %s AND rowid > %s))'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score DESC, rowid ASC LIMIT %s'
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+# MySQL FULLTEXT Search Backend
+class MySQLProductSearch:
+    @property
+    def score(self):
+        return f"MATCH({', '.join(SEARCH_FIELDS)}) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+
+    # InnoDB keeps FULLTEXT indexes in sync with the table itself
+    def index_product(self, product):
+        pass
+
+    def remove_product(self, product_id):
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('OPTIMIZE TABLE ecom_app_product')
+
+    def search(self, query, limit, after=None):
+        query = ' '.join(tokenize(query))
+        if not query:
+            return []
+
+        sql = f'SELECT id, {self.score} AS score FROM ecom_app_product WHERE {self.score}'
+        params = [query, query]
+        if after is not None:
+            sql += f' AND ({self.score} < %s OR ({self.score} = %s AND id > %s))'
+            params += [query, after[0], query, after[0], after[1]]
+        sql += ' ORDER BY score DESC, id ASC LIMIT %s'
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+# Substring Search Backend
+# For databases without a full-text index here. Scans the product table, ranked
+# by the weights of the fields each term is found in
+class IContainsProductSearch:
+    weights = (10.0, 8.0, 2.0, 1.0)
+
+    # Nothing to keep in sync
+    def index_product(self, product):
+        pass
+
+    def remove_product(self, product_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, limit, after=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # Every term must be in some field
+        match = reduce(and_, [
+            reduce(or_, [Q(**{f'{field}__icontains': term}) for field in SEARCH_FIELDS]) for term in terms
+        ])
+        score = sum(
+            Case(When(Q(**{f'{field}__icontains': term}), then=Value(weight)), default=Value(0.0), output_field=FloatField())
+            for term in terms for field, weight in zip(SEARCH_FIELDS, self.weights)
+        )
+        rows = Product.objects.filter(match).annotate(score=score)
+        if after is not None:
+            rows = rows.filter(Q(score__lt=after[0]) | Q(score=after[0], id__gt=after[1]))
+        return list(rows.order_by('-score', 'id').values_list('id', 'score')[:limit])
+
+
+def get_search_backend(vendor=None):
+    vendor = vendor or connection.vendor
+    if vendor == 'sqlite':
+        return SQLiteProductSearch()
+    if vendor == 'mysql':
+        return MySQLProductSearch()
+    return IContainsProductSearch()
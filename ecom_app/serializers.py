@@ -1,4 +1,5 @@
 import re
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Customer, HeroSlider, Categories, Product, ProductVariation, ProductImage, Color, Size, ProductOffer, ShipmentAddress, Cart, Payment, Order
 
@@ -54,8 +55,35 @@ class UserSerializer(serializers.ModelSerializer):
         return value
 
 
+# Srcset Field
+# A <field>_srcset map as {mime type: srcset}, e.g. for <source type="image/webp" srcset="...">
+class SrcsetField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.srcset(value, self.context.get('request'))
+
+    @staticmethod
+    def srcset(value, request=None):
+        srcset = {}
+        for mime_type, widths in (value or {}).items():
+            # Skips the source and pending markers
+            if not mime_type.startswith('image/'):
+                continue
+            urls = []
+            for width, name in sorted(widths.items(), key=lambda item: int(item[0])):
+                url = default_storage.url(name)
+                urls.append(f'{request.build_absolute_uri(url) if request is not None else url} {width}w')
+            srcset[mime_type] = ', '.join(urls)
+        return srcset
+
+
 # HeroSlider Serializer
 class HeroSliderSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField()
+
     class Meta:
         model = HeroSlider
         fields = '__all__'
@@ -63,6 +91,8 @@ class HeroSliderSerializer(serializers.ModelSerializer):
 
 # Category Serializer
 class CategorySerializer(serializers.ModelSerializer):
+    category_image_srcset = SrcsetField()
+
     class Meta:
         model = Categories
         fields = '__all__'
@@ -82,9 +112,11 @@ class SizeSerializer(serializers.ModelSerializer):
 
 # Product Image Serializer
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = SrcsetField(source='image_srcset')
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'srcset']
 
 # Product Variation Serializer
 class ProductVariationSerializer(serializers.ModelSerializer):
@@ -92,11 +124,12 @@ class ProductVariationSerializer(serializers.ModelSerializer):
     size = SizeSerializer()
     product_name = serializers.CharField(source='product.product_name', read_only=True)
     product_image = serializers.CharField(source='product.list_image1', read_only=True)
+    product_image_srcset = SrcsetField(source='product.list_image1_srcset')
     short_description = serializers.CharField(source='product.short_description', read_only=True)
 
     class Meta:
         model = ProductVariation
-        fields = ['id', 'color', 'size', 'original_price', 'discount_price', 'stock', 'product_name', 'product_image', 'short_description']
+        fields = ['id', 'color', 'size', 'original_price', 'discount_price', 'stock', 'product_name', 'product_image', 'product_image_srcset', 'short_description']
 
 # Product Offer Serializer  
 class ProductOfferSerializer(serializers.ModelSerializer):
@@ -110,6 +143,8 @@ class ProductSerializer(serializers.ModelSerializer):
     variations = ProductVariationSerializer(many=True, source='productvariation_set')
     images = serializers.SerializerMethodField()
     offer = ProductOfferSerializer(many=True, source='offers')
+    list_image1_srcset = SrcsetField()
+    list_image2_srcset = SrcsetField()
 
     class Meta:
         model = Product
@@ -117,7 +152,14 @@ class ProductSerializer(serializers.ModelSerializer):
 
     def get_images(self, obj):
         color = self.context.get('color')
-        color_images = ProductImage.objects.filter(product=obj, color=color)
+        if 'product_images' in getattr(obj, '_prefetched_objects_cache', {}):
+            # Images were prefetched, filter by color in memory
+            color_images = [
+                image for image in obj.product_images.all()
+                if color is not None and str(image.color_id) == str(color)
+            ]
+        else:
+            color_images = ProductImage.objects.filter(product=obj, color=color)
         return ProductImageSerializer(color_images, many=True).data
     
 
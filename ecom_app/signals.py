@@ -0,0 +1,135 @@
+from django.apps import apps
+from django.db import connection
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import Signal, receiver
+from rest_framework.authtoken.models import Token
+from .authentication import revoke_cached_token
+from .models import Customer, Categories, Product, Color, Size, ProductVariation, ProductImage, ProductOffer, HeroSlider, ProductFacet
+from .facets import rebuild_product_facets, refresh_stock_facets
+from .images import IMAGE_FIELDS, build_srcset, mark_srcset
+from .jobs import enqueue
+from .search import SEARCH_VENDORS, get_search_backend
+from .snapshots import get_snapshot_store
+
+# Create your signals here.
+
+# Sent when stock is changed with queryset updates, which skip post_save
+stock_changed = Signal()
+
+CATALOG_MODELS = (Categories, Product, Color, Size, ProductVariation, ProductImage, ProductOffer, HeroSlider)
+
+
+def table_name(model):
+    return model._meta.model_name
+
+
+# Bump the version of a catalog table whenever one of its rows changes
+def invalidate_catalog_table(sender, **kwargs):
+    get_snapshot_store().invalidate(table_name(sender))
+
+
+# Connected per model, a receiver without a sender would disable fast deletes everywhere
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_catalog_table, sender=model)
+    post_delete.connect(invalidate_catalog_table, sender=model)
+
+
+# Bump the owning table when a catalog many-to-many relation changes
+@receiver(m2m_changed, sender=Product.category.through)
+@receiver(m2m_changed, sender=ProductOffer.products.through)
+def invalidate_catalog_relation(sender, instance, action, model, **kwargs):
+    if action.startswith('post_'):
+        get_snapshot_store().invalidate(table_name(type(instance)))
+        get_snapshot_store().invalidate(table_name(model))
+
+
+# Resized and WebP copies are built by a job when an image is uploaded or replaced,
+# the row is saved with a pending srcset until then
+def mark_image_srcsets(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    instance._srcset_builds = [
+        field_name for field_name in IMAGE_FIELDS[sender._meta.label]
+        if (update_fields is None or field_name in update_fields) and mark_srcset(instance, field_name)
+    ]
+
+
+def queue_image_srcsets(sender, instance, **kwargs):
+    # Enqueued in the saving transaction, so a rolled back save builds nothing
+    for field_name in getattr(instance, '_srcset_builds', ()):
+        enqueue(build_srcset, label=sender._meta.label, field_name=field_name,
+                name=getattr(instance, field_name).name, pk=instance.pk)
+    instance._srcset_builds = []
+
+
+for label in IMAGE_FIELDS:
+    pre_save.connect(mark_image_srcsets, sender=apps.get_model(label))
+    post_save.connect(queue_image_srcsets, sender=apps.get_model(label))
+
+
+# Keep the product search index in step with product saves
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    if connection.vendor in SEARCH_VENDORS:
+        get_search_backend().index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_indexed_product(sender, instance, **kwargs):
+    if connection.vendor in SEARCH_VENDORS:
+        get_search_backend().remove_product(instance.pk)
+
+
+# Keep the product facet table in step with products, variations and categories
+@receiver(post_save, sender=Product)
+def refresh_product_facets(sender, instance, **kwargs):
+    rebuild_product_facets([instance.pk])
+
+
+@receiver(post_save, sender=ProductVariation)
+def refresh_variation_facets(sender, instance, **kwargs):
+    rebuild_product_facets([instance.product_id])
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+def refresh_category_facets(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        rebuild_product_facets([instance.pk])
+    elif pk_set:
+        rebuild_product_facets(pk_set)
+    else:
+        rebuild_product_facets(set(ProductFacet.objects.filter(category=instance).values_list('product_id', flat=True)))
+
+
+@receiver(pre_delete, sender=Categories)
+def remember_category_products(sender, instance, **kwargs):
+    instance._facet_product_ids = list(instance.product_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Categories)
+def refresh_deleted_category_facets(sender, instance, **kwargs):
+    rebuild_product_facets(getattr(instance, '_facet_product_ids', []))
+
+
+# Sent inside the transaction that moved the stock. The facet refresh is queued in it
+# too, a failure after the commit would report an order that was placed as failed
+@receiver(stock_changed)
+def refresh_changed_stock(sender, variation_ids, **kwargs):
+    get_snapshot_store().invalidate(table_name(ProductVariation))
+    enqueue(refresh_stock_facets, variation_ids=list(variation_ids))
+
+
+# Drop cached tokens when they are deleted or their user changes outside the API
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    revoke_cached_token(instance.key)
+
+
+@receiver(post_save, sender=Customer)
+def revoke_customer_tokens(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        revoke_cached_token(key)
@@ -0,0 +1,254 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+from .routers import primary_reads
+
+# Create your catalog snapshots here.
+
+# Local Memory Snapshot Backend (per process, only safe with a single worker)
+class LocMemSnapshotBackend:
+    # Calls never wait on I/O, so async views make them directly
+    in_process = True
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._modified = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, table):
+        with self._lock:
+            # Seed with the clock so versions are not reused after a restart
+            return self._versions.setdefault(table, time.time_ns())
+
+    def get_modified(self, table):
+        with self._lock:
+            return self._modified.setdefault(table, time.time())
+
+    def incr_version(self, table):
+        with self._lock:
+            self._versions[table] = self._versions.get(table, time.time_ns()) + 1
+            self._modified[table] = time.time()
+            return self._versions[table]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._modified.clear()
+
+
+# Django Cache Snapshot Backend (shared between workers)
+class DjangoCacheSnapshotBackend:
+    in_process = False
+
+    def __init__(self, alias='default', timeout=None, key_prefix='catalog'):
+        self.alias = alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self, table):
+        return f'{self.key_prefix}:version:{table}'
+
+    def _modified_key(self, table):
+        return f'{self.key_prefix}:modified:{table}'
+
+    def get(self, key):
+        return self.cache.get(f'{self.key_prefix}:body:{key}')
+
+    def set(self, key, body):
+        self.cache.set(f'{self.key_prefix}:body:{key}', body, self.timeout)
+
+    def get_version(self, table):
+        version = self.cache.get(self._version_key(table))
+        if version is None:
+            # Seed with the clock so an evicted counter never reuses an old version
+            self.cache.add(self._version_key(table), time.time_ns(), None)
+            version = self.cache.get(self._version_key(table))
+        return version
+
+    def get_modified(self, table):
+        modified = self.cache.get(self._modified_key(table))
+        if modified is None:
+            self.cache.add(self._modified_key(table), time.time(), None)
+            modified = self.cache.get(self._modified_key(table))
+        return modified
+
+    def incr_version(self, table):
+        # A fresh clock value rather than incr(), which most backends run as a get and
+        # a set, so two racing invalidations can never leave the same version behind
+        version = time.time_ns()
+        self.cache.set_many({self._version_key(table): version, self._modified_key(table): time.time()}, None)
+        return version
+
+    def clear(self):
+        # Clears the whole cache alias, so point this backend at a dedicated one
+        self.cache.clear()
+
+
+# Catalog Snapshot Store
+class CatalogSnapshotStore:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def version(self, tables):
+        return '.'.join(str(self.backend.get_version(table)) for table in tables)
+
+    def last_modified(self, tables):
+        return max(self.backend.get_modified(table) for table in tables)
+
+    def make_key(self, tables, url):
+        digest = hashlib.md5(url.encode()).hexdigest()
+        return f'{self.version(tables)}:{digest}'
+
+    def get(self, key):
+        body = self.backend.get(key)
+        with self._lock:
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return body
+
+    def set(self, key, body):
+        self.backend.set(key, body)
+
+    def invalidate(self, table):
+        # Once the writing transaction commits. Bumped before, a miss in between would
+        # cache the old rows under the new version. Robust, the write already happened,
+        # a cache error is logged and the entries expire with the backend timeout
+        transaction.on_commit(lambda: self.backend.incr_version(table), robust=True)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+_store = None
+
+
+def get_snapshot_store():
+    global _store
+    if _store is None:
+        config = settings.CATALOG_SNAPSHOT
+        backend = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+        _store = CatalogSnapshotStore(backend)
+    return _store
+
+
+@receiver(setting_changed)
+def reset_snapshot_store(setting, **kwargs):
+    global _store
+    if setting == 'CATALOG_SNAPSHOT':
+        _store = None
+
+
+async def call_store(func, *args):
+    # For async views. A cache backed store does I/O, which must not block the event loop
+    if get_snapshot_store().backend.in_process:
+        return func(*args)
+    return await sync_to_async(func)(*args)
+
+
+# Catalog Snapshot Mixin
+# Serves list views from pre-rendered JSON bytes keyed on the versions of the tables they read
+class CatalogSnapshotMixin:
+    snapshot_tables = ()
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        store = get_snapshot_store()
+        key = store.make_key(self.snapshot_tables, request.build_absolute_uri())
+        body = store.get(key)
+        if body is None:
+            with primary_reads():
+                response = super().list(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            body = JSONRenderer().render(response.data)
+            store.set(key, body)
+        return HttpResponse(body, content_type='application/json')
+
+
+def catalog_validators(tables, renderer_format):
+    # Strong ETag for a representation of the given tables, and Last-Modified once
+    # their last change is in a past second. Until then another change can land in
+    # the same whole second, and If-Modified-Since would answer it with a stale 304
+    store = get_snapshot_store()
+    version = store.version(tables)
+    etag = quote_etag(hashlib.md5(f'{renderer_format}:{version}'.encode()).hexdigest())
+    last_modified = int(store.last_modified(tables))
+    return etag, last_modified if last_modified < int(time.time()) else None
+
+
+def set_validators(response, etag, last_modified):
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+# Conditional GET Mixin
+# Answers If-None-Match / If-Modified-Since from table versions before any serialization.
+# If-None-Match takes precedence, If-Modified-Since is only read without it.
+# The validators are the primary's versions, so the body is read from the primary too,
+# views using it do not take ReplicaReadMixin
+class ConditionalGetMixin:
+    snapshot_tables = ()
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = catalog_validators(self.snapshot_tables, request.accepted_renderer.format)
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return set_validators(response, etag, last_modified)
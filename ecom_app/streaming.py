@@ -0,0 +1,74 @@
+from contextlib import nullcontext
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from .compiled_serializers import get_compiled_serializer
+from .facets import TRUE_VALUES
+from .routers import replica_reads
+
+# Create your streaming responses here.
+
+def wants_stream(request):
+    return request.query_params.get('stream', '').lower() in TRUE_VALUES
+
+
+def position_after(ordering, row):
+    # Rows strictly after row in ordering, e.g. (a < x) | (a == x & b < y) for ('-a', '-b')
+    condition = Q()
+    equal = {}
+    for field in ordering:
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': row[name]})
+        equal[name] = row[name]
+    return condition
+
+
+def stream_rows(envelope, key, queryset, ordering, serializer_class, context=None, replica=False):
+    # Writes envelope with the rows as a JSON list under key, a keyset chunk at a time.
+    # Each chunk is a fresh query, so no cursor stays open while the client reads
+    renderer = JSONRenderer()
+    compiled = get_compiled_serializer(serializer_class)
+    queryset = compiled.values(queryset).order_by(*ordering)
+    chunk_size = settings.API_STREAM_CHUNK_SIZE
+
+    # key renders last, so the list opens two bytes before the end
+    body = renderer.render({**envelope, key: []})
+    yield body[:-2]
+    after = Q()
+    separator = b''
+    while True:
+        # The view has returned by now, so re-enter its replica routing
+        with replica_reads() if replica else nullcontext():
+            rows = list(queryset.filter(after)[:chunk_size])
+            items = compiled.serialize(rows, context)
+        if items:
+            yield separator + b','.join(renderer.render(item) for item in items)
+            separator = b','
+        if len(rows) < chunk_size:
+            break
+        after = position_after(ordering, rows[-1])
+    yield body[-2:]
+
+
+def streaming_json_response(*args, **kwargs):
+    return StreamingHttpResponse(stream_rows(*args, **kwargs), content_type='application/json')
+
+
+# Streaming List Mixin
+# ?stream=true returns the whole filtered list, unpaginated, in the page envelope
+class StreamingListMixin:
+    def list(self, request, *args, **kwargs):
+        if not wants_stream(request):
+            return super().list(request, *args, **kwargs)
+        ordering = self.pagination_class.ordering
+        return streaming_json_response(
+            {'next': None, 'previous': None},
+            'results',
+            self.filter_queryset(self.get_queryset()),
+            (ordering,) if isinstance(ordering, str) else ordering,
+            self.get_serializer_class(),
+            self.get_serializer_context(),
+            replica=getattr(self, 'reads_from_replica', False),
+        )
@@ -1,3 +1,1442 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from PIL import Image
+from datetime import timedelta
+from unittest import mock
+from django.contrib.sessions.models import Session
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from .management.commands.check_query_plans import full_scans
+from .management.commands.stress_checkout import run_checkout_stress
+from .async_views import AsyncCategoryView, AsyncLoginView, AsyncProductDetailView
+from .authentication import CachedTokenAuthentication, LocMemTokenCache, get_token_cache
+from .carts import build_cart_summary, get_cart_summary
+from .checks import check_shared_caches
+from .compiled_serializers import get_compiled_serializer
+from .hashing import get_hashing_pool
+from .holds import release_expired_holds, set_holds
+from .jobs import job, enqueue, claim_jobs, queue_metrics, requeue_stale_jobs, run_job
+from .middleware import ReplicaPinMiddleware
+from .pagination import ProductCursorPagination
+from .routers import _current_request
+from .search import IContainsProductSearch, get_search_backend
+from .serializers import ProductSerializer, CartSerializer, OrderSerializer
+from .snapshots import CatalogSnapshotStore, DjangoCacheSnapshotBackend, call_store, get_snapshot_store
+from .models import Customer, Categories, Product, Color, Size, ProductVariation, ProductImage, ProductOffer, HeroSlider, Cart, Payment, Order, ProductFacet, Job, StockHold
 
 # Create your tests here.
+
+def create_product(index, color, size, category, offer):
+    product = Product.objects.create(
+        sku=f'SKU-{index}',
+        product_name=f'Product {index}',
+        short_description='Short description',
+        full_description='Full description',
+    )
+    product.category.add(category)
+    offer.products.add(product)
+    ProductVariation.objects.create(
+        product=product, color=color, size=size, original_price=100, discount_price=80, stock=10
+    )
+    ProductImage.objects.create(product=product, color=color, image=f'products/{index}.jpg')
+    return product
+
+
+# Catalog Fixture Mixin
+# The color, size, category and offer most tests build their products from
+class CatalogFixtureMixin:
+    @classmethod
+    def create_catalog(cls):
+        cls.color = Color.objects.create(color='Red')
+        cls.size = Size.objects.create(size='M')
+        cls.category = Categories.objects.create(category_name='Shirts', category_image='category/shirts.jpg')
+        cls.offer = ProductOffer.objects.create(offer='10% off')
+
+    def add_product(self, index, category=None):
+        return create_product(index, self.color, self.size, category or self.category, self.offer)
+
+    def add_variation(self, index):
+        return self.add_product(index).productvariation_set.get()
+
+
+# Catalog Test Case
+# Creates the catalog once per class, every test starts from an empty snapshot store
+class CatalogTestCase(CatalogFixtureMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_catalog()
+
+    def setUp(self):
+        get_snapshot_store().clear()
+
+
+# Product Listing Query Tests
+class ProductQueryCountTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_product_list_query_count_is_constant(self):
+        self.add_product(1)
+        with self.assertNumQueries(9):
+            self.client.get(reverse('product'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(2, 12):
+                self.add_product(index)
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse('product'))
+        self.assertEqual(len(response.json()['results']), 11)
+
+    def test_product_detail_filters_images_by_color(self):
+        product = self.add_product(1)
+        url = reverse('product-detail', kwargs={'id': product.id})
+
+        with self.assertNumQueries(6):
+            response = self.client.get(url, {'color': self.color.id})
+        self.assertEqual(len(response.data['images']), 1)
+        self.assertEqual(response.data['variations'][0]['product_name'], 'Product 1')
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['images'], [])
+
+
+# Compiled Serializer Tests
+class CompiledSerializerTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        tops = Categories.objects.create(category_name='Tops', category_image='category/tops.jpg')
+        for index in range(3):
+            product = self.add_product(index, tops)
+            product.category.add(self.category)
+            if index:
+                Product.objects.filter(id=product.id).update(
+                    list_image1=f'productlist/{index}.jpg', new=True,
+                    list_image1_srcset={'source': f'productlist/{index}.jpg', 'image/webp': {'320': f'derivatives/{index}/320w.webp'}},
+                )
+            variation = product.productvariation_set.get()
+            ProductVariation.objects.filter(id=variation.id).update(discount_price=None if index else 80)
+            Cart.objects.create(customer=self.user, product=variation, quantity=index + 1)
+            payment = Payment.objects.create(customer=self.user, amount=80, razorpay_payment_id=f'pay_{index}')
+            Order.objects.create(customer=self.user, payment=payment, product_variation=variation, quantity=1, total_amount=80)
+        Cart.objects.create(customer=self.user, product=None)
+        self.request = APIRequestFactory().get('/')
+
+    def assertSameJson(self, serializer_class, queryset, context):
+        compiled = get_compiled_serializer(serializer_class)
+        self.assertEqual(
+            JSONRenderer().render(compiled.serialize(compiled.values(queryset), context)),
+            JSONRenderer().render(serializer_class(queryset, many=True, context=context).data),
+        )
+
+    def test_output_matches_model_serializers(self):
+        products = Product.objects.for_listing().order_by('id')
+        self.assertSameJson(ProductSerializer, products, {'request': self.request})
+        self.assertSameJson(ProductSerializer, products, {'request': self.request, 'color': str(self.color.id)})
+        self.assertSameJson(CartSerializer, Cart.objects.order_by('id'), {'request': self.request})
+        self.assertSameJson(OrderSerializer, Order.objects.order_by('order_id'), {'request': self.request})
+
+    def test_views_render_the_same_response(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for url in (reverse('product'), reverse('cart'), reverse('create_order')):
+            compiled = client.get(url).content
+            get_snapshot_store().clear()
+            with override_settings(API_COMPILED_SERIALIZERS=False):
+                self.assertEqual(client.get(url).content, compiled)
+
+
+def image_upload(name, size=(800, 600), mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'red').save(buffer, 'PNG' if mode == 'RGBA' else 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+# Image Derivative Tests
+@override_settings(IMAGE_DERIVATIVES={'WIDTHS': [320, 640, 1024], 'QUALITY': 80, 'PATH': 'derivatives'})
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        get_snapshot_store().clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def run_jobs(self):
+        # Jobs run in the test transaction, commit hooks bump the snapshot versions
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('run_workers', burst=True, stdout=io.StringIO())
+
+    def test_upload_builds_resized_webp_copies(self):
+        slide = HeroSlider.objects.create(title='Sale', description='Sale', url='/', bg='red', image=image_upload('sale.jpg'))
+        self.assertEqual(slide.image_srcset, {'source': slide.image.name, 'pending': True})
+        self.assertEqual(self.client.get(reverse('hero_slider')).json()[0]['image_srcset'], {})
+
+        self.run_jobs()
+        slide.refresh_from_db()
+        self.assertEqual(slide.image_srcset['source'], slide.image.name)
+        self.assertEqual(sorted(slide.image_srcset['image/webp']), ['320', '640'])
+        with default_storage.open(slide.image_srcset['image/webp']['320']) as derivative:
+            self.assertEqual(Image.open(derivative).size, (320, 240))
+
+        response = self.client.get(reverse('hero_slider'))
+        srcset = response.json()[0]['image_srcset']
+        self.assertEqual(set(srcset), {'image/webp', 'image/jpeg'})
+        self.assertRegex(srcset['image/webp'], r'^http://testserver/media/derivatives/\S+/320w\.webp 320w, \S+/640w\.webp 640w$')
+
+    def test_same_content_shares_derivatives(self):
+        first = HeroSlider.objects.create(title='A', description='A', url='/', bg='red', image=image_upload('a.png', mode='RGBA'))
+        second = HeroSlider.objects.create(title='B', description='B', url='/', bg='red', image=image_upload('b.png', mode='RGBA'))
+        self.run_jobs()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertNotEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_srcset['image/png'], second.image_srcset['image/png'])
+
+    def test_backfill_builds_stale_srcsets(self):
+        name = default_storage.save('heroSlider/old.jpg', image_upload('old.jpg', size=(200, 100)))
+        HeroSlider.objects.create(title='Old', description='Old', url='/', bg='red', image=name)
+        call_command('build_image_derivatives', processes=1, stdout=io.StringIO())
+        srcset = HeroSlider.objects.get().image_srcset
+        self.assertEqual(srcset['source'], name)
+        self.assertEqual(list(srcset['image/webp']), ['200'])
+
+    @override_settings(CATALOG_SNAPSHOT={'BACKEND': 'ecom_app.snapshots.LocMemSnapshotBackend'})
+    def test_jobs_need_a_shared_snapshot_store(self):
+        # The web workers would keep serving the old srcsets
+        for command in ('run_workers', 'build_image_derivatives'):
+            with self.assertRaisesMessage(CommandError, 'Use a shared snapshot backend.'):
+                call_command(command, stdout=io.StringIO())
+
+
+@job(max_attempts=2)
+def flaky_job(fail):
+    if fail:
+        raise RuntimeError('Flaky job failed.')
+    Color.objects.create(color='Done')
+
+
+# Job Queue Tests
+class JobQueueTests(TestCase):
+    def run_workers(self):
+        output = io.StringIO()
+        call_command('run_workers', burst=True, stdout=output)
+        return output.getvalue()
+
+    def test_jobs_run_and_are_deleted(self):
+        enqueue(flaky_job, fail=False)
+        enqueue(flaky_job, fail=False, delay=timedelta(hours=1))
+        self.assertIn('1 done, 0 retried, 0 failed', self.run_workers())
+        self.assertTrue(Color.objects.filter(color='Done').exists())
+        self.assertEqual(list(Job.objects.values_list('status', flat=True)), ['Queued'])
+
+    def test_failed_jobs_back_off_then_fail(self):
+        queued = enqueue(flaky_job, fail=True)
+        self.assertIn('0 done, 1 retried, 0 failed', self.run_workers())
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('Queued', 1))
+        self.assertGreater(queued.run_after, timezone.now())
+        self.assertIn('Flaky job failed.', queued.last_error)
+
+        Job.objects.update(run_after=timezone.now())
+        self.assertIn('0 done, 0 retried, 1 failed', self.run_workers())
+        self.assertEqual(Job.objects.get().status, 'Failed')
+
+    def test_claimed_jobs_are_not_handed_out_twice(self):
+        for _ in range(3):
+            enqueue(flaky_job, fail=False)
+        first = claim_jobs('worker-1', 2)
+        second = claim_jobs('worker-2', 2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({job.id for job in first} & {job.id for job in second})
+        self.assertEqual(claim_jobs('worker-3', 2), [])
+
+        # The claim of a worker that died runs out
+        Job.objects.filter(id=second[0].id).update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual([job.id for job in claim_jobs('worker-3', 2)], [second[0].id])
+
+    def test_late_worker_leaves_the_new_claim_alone(self):
+        enqueue(flaky_job, fail=False)
+        [late] = claim_jobs('worker-1', 1)
+        Job.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        requeue_stale_jobs()
+        [current] = claim_jobs('worker-2', 1)
+        run_job(late)
+        self.assertEqual(Job.objects.get().claimed_by, current.claimed_by)
+
+    def test_queue_metrics(self):
+        enqueue(flaky_job, fail=False)
+        enqueue(flaky_job, fail=False, delay=timedelta(hours=1))
+        with self.assertNumQueries(1):
+            metrics = queue_metrics()
+        self.assertEqual((metrics['queued'], metrics['due'], metrics['running']), (2, 1, 0))
+
+
+# Media Serving Tests
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.name = default_storage.save('products/shirt.jpg', io.BytesIO(b'0123456789'))
+        self.url = reverse('media', args=[self.name])
+
+    def test_whole_file_and_revalidation(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        response.close()
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        for header, status, body, content_range in (
+            ('bytes=2-5', 206, b'2345', 'bytes 2-5/10'),
+            ('bytes=7-', 206, b'789', 'bytes 7-9/10'),
+            ('bytes=-3', 206, b'789', 'bytes 7-9/10'),
+            ('bytes=8-100', 206, b'89', 'bytes 8-9/10'),
+            ('bytes=0-1,4-5', 200, b'0123456789', None),
+        ):
+            response = self.client.get(self.url, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, status, header)
+            self.assertEqual(b''.join(response.streaming_content), body, header)
+            self.assertEqual(response.get('Content-Range'), content_range, header)
+            response.close()
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_derivatives_are_immutable(self):
+        name = default_storage.save('derivatives/ab/cdef/320w.webp', io.BytesIO(b'webp'))
+        response = self.client.get(reverse('media', args=[name]))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        response.close()
+
+    def test_offload_to_front_proxy(self):
+        with override_settings(MEDIA_SERVING={'MODE': 'x-accel-redirect', 'ACCEL_PREFIX': '/protected-media/', 'MAX_AGE': 60}):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/products/shirt.jpg')
+        self.assertEqual(response.content, b'')
+        with override_settings(MEDIA_SERVING={'MODE': 'x-sendfile', 'ACCEL_PREFIX': '', 'MAX_AGE': 60}):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.name))
+
+    def test_paths_outside_media_root_are_not_found(self):
+        self.assertEqual(self.client.get('/media/..%2Fmanage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/products/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/products/').status_code, 404)
+
+
+# Streaming Response Tests
+@override_settings(API_STREAM_CHUNK_SIZE=2)
+class StreamingResponseTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        self.client.force_authenticate(self.user)
+        order_date = timezone.now()
+        for index in range(5):
+            variation = self.add_variation(index)
+            payment = Payment.objects.create(customer=self.user, amount=80, razorpay_payment_id=f'pay_{index}')
+            # Shared dates, so the stream has to break ties on order_id
+            Order.objects.create(
+                customer=self.user, payment=payment, product_variation=variation, quantity=1,
+                order_date=order_date - timedelta(days=index // 2),
+            )
+
+    def stream(self, url):
+        response = self.client.get(url, {'stream': 'true'})
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_stream_matches_the_pages(self):
+        products = self.stream(reverse('product'))
+        page = self.client.get(reverse('product'), {'page_size': 100}).json()
+        self.assertEqual(products, {'next': None, 'previous': None, 'results': page['results']})
+
+        orders = self.stream(reverse('create_order'))
+        page = self.client.get(reverse('create_order'), {'page_size': 100}).json()
+        self.assertEqual(orders['data'], page['data'])
+        self.assertEqual(len(orders['data']), 5)
+
+    def test_each_chunk_is_a_bounded_query(self):
+        response = self.client.get(reverse('create_order'), {'stream': 'true'})
+        # Five orders in chunks of two, one query per chunk
+        with self.assertNumQueries(3):
+            b''.join(response.streaming_content)
+
+
+# Order Export Tests
+class OrderExportTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.staff = Customer.objects.create_user(email='finance@example.com', password='secret123', is_staff=True)
+        customer = Customer.objects.create_user(email='buyer@example.com', password='secret123', first_name='Asha')
+        variation = self.add_variation(1)
+        self.orders = []
+        for index, day in enumerate((1, 2, 3)):
+            payment = Payment.objects.create(customer=customer, amount=80, razorpay_payment_id=f'pay_{index}')
+            self.orders.append(Order.objects.create(
+                customer=customer, payment=payment, product_variation=variation, quantity=1, total_amount=80,
+                order_date=timezone.make_aware(timezone.datetime(2026, 5, day, 12)),
+            ))
+
+    def export(self, **params):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(reverse('order_export'), params)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_rows_join_payment_customer_and_variation(self):
+        response, body = self.export(start='2026-05-02', end='2026-05-03')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['order_id'] for row in rows], [order.order_id for order in self.orders[1:]])
+        self.assertEqual(rows[0]['razorpay_payment_id'], 'pay_1')
+        self.assertEqual(rows[0]['customer_first_name'], 'Asha')
+        self.assertEqual(rows[0]['sku'], 'SKU-1')
+        self.assertEqual(rows[0]['total_amount'], '80.00')
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_csv_resumes_after_watermark(self):
+        response, body = self.export(output='csv', after_order_id=self.orders[0].order_id)
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([int(row['order_id']) for row in rows], [order.order_id for order in self.orders[1:]])
+
+    def test_staff_only(self):
+        self.client.force_authenticate(Customer.objects.get(email='buyer@example.com'))
+        self.assertEqual(self.client.get(reverse('order_export')).status_code, 403)
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get(reverse('order_export'), {'start': 'May 1st'}).status_code, 400)
+
+    def test_command_appends_when_resuming(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orders.csv')
+            call_command('export_orders', format='csv', output=path, end='2026-05-01', stderr=io.StringIO())
+            call_command(
+                'export_orders', format='csv', output=path, after_order_id=str(self.orders[0].order_id),
+                chunk_size=1, stderr=io.StringIO(),
+            )
+            with open(path, newline='') as export:
+                rows = list(csv.DictReader(export))
+        self.assertEqual([int(row['order_id']) for row in rows], [order.order_id for order in self.orders])
+
+
+# Cursor Pagination Tests
+class CursorPaginationTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.products = [self.add_product(index) for index in range(5)]
+
+    def test_product_pages_are_stable_and_capped(self):
+        page = self.client.get(reverse('product'), {'page_size': 2}).json()
+        ids = [product['id'] for product in page['results']]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            ids += [product['id'] for product in page['results']]
+        self.assertEqual(ids, [product.id for product in self.products])
+
+        with mock.patch.object(ProductCursorPagination, 'max_page_size', 3):
+            page = self.client.get(reverse('product'), {'page_size': 10000}).json()
+        self.assertEqual(len(page['results']), 3)
+        self.assertIsNotNone(page['next'])
+
+    def test_orders_are_paginated_newest_first(self):
+        user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        self.client.force_authenticate(user)
+        payment = Payment.objects.create(customer=user, amount=100, razorpay_payment_id='pay_1')
+        variation = self.products[0].productvariation_set.get()
+        now = timezone.now()
+        orders = [
+            Order.objects.create(
+                customer=user, payment=payment, product_variation=variation,
+                quantity=1, order_date=now - timedelta(days=index % 2),
+            )
+            for index in range(5)
+        ]
+
+        response = self.client.get(reverse('create_order'), {'page_size': 2})
+        order_ids = [order['order_id'] for order in response.data['data']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            order_ids += [order['order_id'] for order in response.data['data']]
+
+        expected = sorted(orders, key=lambda order: (order.order_date, order.order_id), reverse=True)
+        self.assertEqual(order_ids, [order.order_id for order in expected])
+
+
+# Catalog Snapshot Tests
+class CatalogSnapshotTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = get_snapshot_store()
+        self.client = APIClient()
+
+    def test_snapshot_hit_skips_the_database(self):
+        first = self.client.get(reverse('category'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('category'))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(self.store.stats()['hits'], 1)
+        self.assertEqual(self.store.stats()['misses'], 1)
+
+    def test_snapshot_is_rebuilt_after_model_changes(self):
+        self.client.get(reverse('category'))
+        self.category.category_name = 'Shoes'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        response = self.client.get(reverse('category'))
+        self.assertEqual(response.json()[0]['category_name'], 'Shoes')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.add_product(1)
+        self.client.get(reverse('product'))
+        with self.captureOnCommitCallbacks(execute=True):
+            product.category.clear()
+        response = self.client.get(reverse('product'))
+        self.assertEqual(response.json()['results'][0]['category'], [])
+        self.assertEqual(self.store.stats()['hits'], 0)
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        CATALOG_SNAPSHOT={'BACKEND': 'ecom_app.snapshots.DjangoCacheSnapshotBackend'},
+    )
+    def test_django_cache_backend(self):
+        store = get_snapshot_store()
+        self.client.get(reverse('category'))
+        self.client.get(reverse('category'))
+        self.assertEqual(store.stats()['hits'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Categories.objects.create(category_name='Shoes', category_image='category/shoes.jpg')
+        response = self.client.get(reverse('category'))
+        self.assertEqual(len(response.json()), 2)
+
+    def test_versions_move_when_the_write_commits(self):
+        url = reverse('category')
+        etag = self.client.get(url).headers['ETag']
+        version = self.store.version(['categories'])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.category.category_name = 'Shoes'
+            self.category.save()
+        # Until the commit other workers read the old rows, which must stay under the old
+        # version, else they would be cached and validated as the new one
+        self.assertEqual(self.store.version(['categories']), version)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        for callback in callbacks:
+            callback()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['category_name'], 'Shoes')
+
+    def test_workers_share_table_versions(self):
+        # A second store stands in for another worker process
+        other_worker = CatalogSnapshotStore(DjangoCacheSnapshotBackend(alias='catalog'))
+        version = other_worker.version(['categories'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertNotEqual(other_worker.version(['categories']), version)
+        with override_settings(CATALOG_SNAPSHOT={'BACKEND': 'ecom_app.snapshots.LocMemSnapshotBackend'}):
+            self.assertEqual([error.id for error in check_shared_caches(None)], ['ecom_app.E001'])
+        self.assertEqual(check_shared_caches(None), [])
+
+    def test_invalidation_keeps_fast_deletes(self):
+        # A post_delete receiver without a sender would make this a SELECT and a DELETE
+        Job.objects.create(name='noop')
+        with self.assertNumQueries(1):
+            Job.objects.all().delete()
+
+
+# Conditional GET Tests
+class ConditionalGetTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_matching_etag_returns_not_modified_without_queries(self):
+        response = self.client.get(reverse('category'))
+        etag = response.headers['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('category'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Categories.objects.create(category_name='Shoes', category_image='category/shoes.jpg')
+        response = self.client.get(reverse('category'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_if_modified_since_on_product_detail(self):
+        product = self.add_product(1)
+        url = reverse('product-detail', kwargs={'id': product.id})
+
+        # A change in the current second gives no Last-Modified to compare against
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response.headers)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date()).status_code, 200)
+
+        with mock.patch('ecom_app.snapshots.time.time', return_value=time.time() + 2):
+            last_modified = self.client.get(url).headers['Last-Modified']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 304)
+            # If-None-Match wins over a matching If-Modified-Since
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified, HTTP_IF_NONE_MATCH='"stale"')
+            self.assertEqual(response.status_code, 200)
+
+    def test_missing_product_is_not_cached(self):
+        response = self.client.get(reverse('product-detail', kwargs={'id': 999}))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response.headers)
+
+
+# Product Search Tests
+class ProductSearchTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def search(self, **params):
+        return self.client.get(reverse('product-search'), params)
+
+    def test_results_are_ranked_and_index_follows_saves(self):
+        linen = self.add_product(1)
+        linen.product_name = 'Linen Shirt'
+        linen.save()
+        cotton = self.add_product(2)
+        cotton.full_description = 'Pairs well with a linen jacket'
+        cotton.save()
+
+        response = self.search(q='linen')
+        self.assertEqual([product['id'] for product in response.data['data']], [linen.id, cotton.id])
+        self.assertEqual(self.search(q='lin').data['data'][0]['id'], linen.id)
+
+        linen.delete()
+        response = self.search(q='linen')
+        self.assertEqual([product['id'] for product in response.data['data']], [cotton.id])
+
+    def test_pages_follow_the_cursor(self):
+        products = [self.add_product(index) for index in range(5)]
+        response = self.search(q='product', page_size=2)
+        ids = [product['id'] for product in response.data['data']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids += [product['id'] for product in response.data['data']]
+        self.assertEqual(sorted(ids), [product.id for product in products])
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_query_is_required_and_cursor_validated(self):
+        self.assertEqual(self.search(q='  ').status_code, 400)
+        self.assertEqual(self.search(q='shirt', cursor='garbage').status_code, 404)
+
+    def test_other_databases_fall_back_to_substring_search(self):
+        backend = get_search_backend('postgresql')
+        self.assertIsInstance(backend, IContainsProductSearch)
+        linen = self.add_product(1)
+        linen.product_name = 'Linen Shirt'
+        linen.save()
+        cotton = self.add_product(2)
+        cotton.full_description = 'Pairs well with a linen jacket'
+        cotton.save()
+
+        rows = backend.search('linen', 1)
+        self.assertEqual(rows, [(linen.id, 10.0)])
+        self.assertEqual(backend.search('linen', 2, after=(10.0, linen.id)), [(cotton.id, 1.0)])
+        self.assertEqual(backend.search('linen jacket', 10), [(cotton.id, 2.0)])
+
+
+# Product Facet Tests
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        get_snapshot_store().clear()
+        self.client = APIClient()
+        self.red = Color.objects.create(color='Red')
+        self.blue = Color.objects.create(color='Blue')
+        self.small = Size.objects.create(size='S')
+        self.large = Size.objects.create(size='L')
+        self.shirts = Categories.objects.create(category_name='Shirts', category_image='category/shirts.jpg')
+        self.shoes = Categories.objects.create(category_name='Shoes', category_image='category/shoes.jpg')
+        offer = ProductOffer.objects.create(offer='10% off')
+
+        self.shirt = create_product(1, self.red, self.small, self.shirts, offer)
+        ProductVariation.objects.create(
+            product=self.shirt, color=self.blue, size=self.large, original_price=200, discount_price=None, stock=0
+        )
+        self.shoe = create_product(2, self.blue, self.small, self.shoes, offer)
+        self.shoe.featured = True
+        self.shoe.save()
+
+    def get_products(self, **params):
+        return self.client.get(reverse('product'), params).json()
+
+    def test_facet_table_follows_model_changes(self):
+        self.assertEqual(ProductFacet.objects.filter(product=self.shirt).count(), 2)
+        self.shirt.category.add(self.shoes)
+        self.assertEqual(ProductFacet.objects.filter(product=self.shirt).count(), 4)
+        self.shoes.delete()
+        self.assertEqual(ProductFacet.objects.filter(product=self.shoe, category=None).count(), 1)
+
+    def test_filters_apply_to_the_same_variation(self):
+        ids = lambda page: [product['id'] for product in page['results']]
+        self.assertEqual(ids(self.get_products(color=self.red.id)), [self.shirt.id])
+        self.assertEqual(ids(self.get_products(color=self.blue.id, size=self.large.id)), [self.shirt.id])
+        self.assertEqual(ids(self.get_products(color=self.blue.id, in_stock='true')), [self.shoe.id])
+        self.assertEqual(ids(self.get_products(min_price=150)), [self.shirt.id])
+        self.assertEqual(ids(self.get_products(featured='true')), [self.shoe.id])
+        self.assertEqual(self.client.get(reverse('product'), {'color': 'red'}).status_code, 400)
+
+    def test_facet_counts_exclude_their_own_filter(self):
+        with self.assertNumQueries(4 + 5):
+            page = self.get_products(color=self.red.id)
+        facets = page['facets']
+        self.assertEqual(facets['color'], {str(self.red.id): 1, str(self.blue.id): 2})
+        self.assertEqual(facets['category'], {str(self.shirts.id): 1})
+        self.assertEqual(facets['size'], {str(self.small.id): 1})
+        self.assertEqual(facets['in_stock'], 1)
+        self.assertEqual(facets['featured'], 0)
+        self.assertEqual(facets['price'], {'min': '80.00', 'max': '80.00'})
+
+
+# Batch Cart Tests
+class BatchCartTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.variations = [self.add_variation(index) for index in range(3)]
+
+    def batch(self, operations):
+        return self.client.post(reverse('batch_cart'), {'operations': operations}, format='json')
+
+    def test_operations_are_applied_together(self):
+        Cart.objects.create(customer=self.user, product=self.variations[0], quantity=1)
+        Cart.objects.create(customer=self.user, product=self.variations[1], quantity=1)
+
+        response = self.batch([
+            {'op': 'add', 'product_variation_id': self.variations[0].id, 'quantity': 2},
+            {'op': 'remove', 'product_variation_id': self.variations[1].id},
+            {'op': 'add', 'product_variation_id': self.variations[2].id},
+            {'op': 'set', 'product_variation_id': self.variations[2].id, 'quantity': 5},
+        ])
+        self.assertEqual(response.status_code, 200)
+        lines = {line['product']['id']: line['quantity'] for line in response.data['data']}
+        self.assertEqual(lines, {self.variations[0].id: 3, self.variations[2].id: 5})
+
+    def test_query_count_does_not_grow_with_operations(self):
+        operations = [{'op': 'add', 'product_variation_id': variation.id} for variation in self.variations]
+        with self.assertNumQueries(11):
+            self.batch(operations)
+
+    def test_boolean_quantity_is_rejected(self):
+        response = self.batch([{'op': 'add', 'product_variation_id': self.variations[0].id, 'quantity': True}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_line_inserted_concurrently_is_retried(self):
+        variation = self.variations[0]
+        real_bulk_create = Cart.objects.bulk_create
+
+        def concurrent_insert(objs, *args, **kwargs):
+            # Another request adds the same line first, only the first time round
+            if not getattr(concurrent_insert, 'done', False):
+                concurrent_insert.done = True
+                Cart.objects.create(customer=self.user, product=variation, quantity=1)
+            return real_bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Cart.objects, 'bulk_create', concurrent_insert):
+            response = self.batch([{'op': 'add', 'product_variation_id': variation.id, 'quantity': 2}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cart.objects.get(customer=self.user, product=variation).quantity, 2)
+
+    def test_unknown_variation_rejects_the_whole_batch(self):
+        response = self.batch([
+            {'op': 'add', 'product_variation_id': self.variations[0].id},
+            {'op': 'add', 'product_variation_id': 999},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['product_variation_ids'], [999])
+        self.assertFalse(Cart.objects.exists())
+
+
+# Cart Summary Tests
+class CartSummaryTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        self.client = APIClient()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.discounted, self.full_price = [self.add_variation(index) for index in range(2)]
+        ProductVariation.objects.filter(id=self.full_price.id).update(discount_price=None, original_price=50, stock=1)
+        Cart.objects.create(customer=self.user, product=self.discounted, quantity=2)
+        Cart.objects.create(customer=self.user, product=self.full_price, quantity=2)
+        Cart.objects.create(customer=self.user, product=None)
+
+    def test_totals_come_from_one_query(self):
+        # Then one more for the stock
+        with self.assertNumQueries(2):
+            summary = build_cart_summary(self.user.pk)
+        self.assertEqual(
+            {key: summary[key] for key in ('line_count', 'item_count', 'subtotal', 'discount', 'out_of_stock')},
+            {'line_count': 2, 'item_count': 4, 'subtotal': '260.00', 'discount': '40.00', 'out_of_stock': [self.full_price.id]},
+        )
+        self.assertEqual(
+            [(line['effective_price'], line['line_total'], line['in_stock']) for line in summary['lines']],
+            [('80.00', '160.00', True), ('50.00', '100.00', False)],
+        )
+        self.assertEqual(build_cart_summary(Customer.objects.create_user(email='new@example.com')), {
+            'line_count': 0, 'item_count': 0, 'subtotal': '0.00', 'discount': '0.00', 'out_of_stock': [], 'lines': [],
+        })
+
+    def test_summary_is_cached_until_the_cart_or_prices_change(self):
+        self.assertEqual(self.client.get(reverse('cart_summary')).data['data']['subtotal'], '260.00')
+        # Only the stock is read
+        with self.assertNumQueries(1):
+            get_cart_summary(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('add_to_cart'), {'product_variation_id': self.discounted.id, 'quantity': 1}, format='json')
+        self.assertEqual(self.client.get(reverse('cart_summary')).data['data']['subtotal'], '340.00')
+
+        self.full_price.refresh_from_db()
+        self.full_price.discount_price = 40
+        with self.captureOnCommitCallbacks(execute=True):
+            self.full_price.save()
+        self.assertEqual(self.client.get(reverse('cart_summary')).data['data']['subtotal'], '320.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('delete-cart-item', args=[self.full_price.id]))
+        self.assertEqual(self.client.get(reverse('cart_summary')).data['data']['line_count'], 1)
+
+    def test_cached_summary_shows_current_stock(self):
+        get_cart_summary(self.user.pk)
+        other = Customer.objects.create_user(email='other@example.com', password='secret123')
+        set_holds(other.pk, {self.discounted.id: 9})
+        line = get_cart_summary(self.user.pk)['lines'][0]
+        self.assertEqual((line['available_stock'], line['in_stock']), (1, False))
+        self.assertEqual(get_cart_summary(self.user.pk)['out_of_stock'], [self.discounted.id, self.full_price.id])
+
+    def test_cart_list_keeps_its_shape(self):
+        # A bare list of lines, the totals are served by /cart/summary/
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(len(response.json()), 3)
+
+    def test_summary_cache_must_be_shared(self):
+        with override_settings(
+            CACHES={**settings.CACHES, 'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            CART_SUMMARY={'CACHE': 'local', 'TIMEOUT': 300},
+        ):
+            self.assertEqual([error.id for error in check_shared_caches(None)], ['ecom_app.E003'])
+
+
+# Hot Lookup Index Tests
+class HotLookupIndexTests(CatalogTestCase):
+    def test_hot_queries_do_not_scan_tables(self):
+        call_command('check_query_plans', stdout=io.StringIO())
+
+    def test_whole_index_walks_count_as_scans(self):
+        plan = [
+            {'detail': 'SCAN TABLE ecom_app_product'},
+            {'detail': 'SCAN ecom_app_product USING COVERING INDEX product_new_id_idx'},
+            {'detail': 'SEARCH ecom_app_product USING INDEX product_new_id_idx (new=?)'},
+        ]
+        self.assertEqual(full_scans(plan), [row['detail'] for row in plan[:2]])
+
+    def test_cart_line_is_unique_per_variation(self):
+        user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        variation = self.add_variation(0)
+        Cart.objects.create(customer=user, product=variation)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cart.objects.create(customer=user, product=variation)
+
+
+# Stock Reservation Tests
+class OrderStockTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.variation = self.add_variation(1)
+        Payment.objects.create(customer=self.user, amount=100, razorpay_payment_id='pay_1')
+        Payment.objects.create(customer=self.user, amount=100, razorpay_payment_id='pay_2')
+
+    def order(self, payment_id, quantity):
+        return self.client.post(reverse('create_order'), {
+            'payment_id': payment_id, 'product_variation_id': self.variation.id, 'quantity': quantity
+        }, format='json')
+
+    def test_stock_is_reserved_atomically(self):
+        response = self.order('pay_1', 8)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['data']['product_variation']['stock'], 2)
+        response = self.order('pay_2', 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Not enough stock available.')
+        self.variation.refresh_from_db()
+        self.assertEqual(self.variation.stock, 2)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.order('pay_2', -3).status_code, 400)
+
+    def test_sold_out_variation_leaves_in_stock_facet(self):
+        self.order('pay_1', 10)
+        self.assertTrue(ProductFacet.objects.get(variation=self.variation).in_stock)
+        # Refreshed by a queued job
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('run_workers', burst=True, stdout=io.StringIO())
+        self.assertFalse(ProductFacet.objects.get(variation=self.variation).in_stock)
+
+
+# Checkout Tests
+class CheckoutTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.variations = [self.add_variation(index) for index in range(3)]
+        Payment.objects.create(customer=self.user, amount=100, razorpay_payment_id='pay_1')
+
+    def checkout(self):
+        return self.client.post(reverse('checkout'), {'payment_id': 'pay_1'}, format='json')
+
+    def test_checkout_places_every_cart_line(self):
+        for quantity, variation in enumerate(self.variations, start=1):
+            Cart.objects.create(customer=self.user, product=variation, quantity=quantity)
+
+        # Including the queued stock facet refresh
+        with self.assertNumQueries(13):
+            response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([order['quantity'] for order in response.data['data']], [1, 2, 3])
+        self.assertEqual(response.data['data'][2]['total_amount'], '240.00')
+        self.assertFalse(Cart.objects.filter(customer=self.user).exists())
+        self.assertEqual(
+            list(ProductVariation.objects.order_by('id').values_list('stock', flat=True)), [9, 8, 7]
+        )
+        self.assertEqual(self.checkout().data['message'], 'Order already exists.')
+
+    def test_lines_without_a_discount_sell_at_the_original_price(self):
+        ProductVariation.objects.filter(id=self.variations[0].id).update(discount_price=None)
+        Cart.objects.create(customer=self.user, product=self.variations[0], quantity=2)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['data'][0]['total_amount'], '200.00')
+
+    def test_checkout_is_all_or_nothing(self):
+        Cart.objects.create(customer=self.user, product=self.variations[0], quantity=2)
+        Cart.objects.create(customer=self.user, product=self.variations[1], quantity=11)
+
+        response = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['product_variation_id'], self.variations[1].id)
+        self.assertEqual(ProductVariation.objects.get(id=self.variations[0].id).stock, 10)
+        self.assertEqual(Cart.objects.filter(customer=self.user).count(), 2)
+        self.assertFalse(Order.objects.exists())
+
+
+# Stock Hold Tests
+class StockHoldTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        self.other = Customer.objects.create_user(email='other@example.com', password='secret123')
+        self.client.force_authenticate(self.user)
+        self.variations = [self.add_variation(index) for index in range(2)]
+        self.variation = self.variations[0]
+        Payment.objects.create(customer=self.user, amount=100, razorpay_payment_id='pay_1')
+
+    def add(self, quantity, variation=None):
+        return self.client.post(reverse('add_to_cart'), {
+            'product_variation_id': (variation or self.variation).id, 'quantity': quantity
+        }, format='json')
+
+    def stock(self, variation=None):
+        return ProductVariation.objects.values_list('stock', 'held').get(id=(variation or self.variation).id)
+
+    def test_cart_changes_move_the_hold(self):
+        self.assertEqual(self.add(3).status_code, 200)
+        self.assertEqual(self.add(2).status_code, 200)
+        self.assertEqual(self.stock(), (10, 5))
+        self.assertEqual(StockHold.objects.get(customer=self.user).quantity, 5)
+
+        self.client.post(reverse('update_cart'), {'product_variation_id': self.variation.id, 'quantity': 1}, format='json')
+        self.assertEqual(self.stock(), (10, 1))
+        self.client.delete(reverse('delete-cart-item', args=[self.variation.id]))
+        self.assertEqual(self.stock(), (10, 0))
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_held_stock_is_not_available_to_others(self):
+        self.add(8)
+        self.assertEqual(set_holds(self.other.pk, {self.variations[1].id: 1, self.variation.id: 3}), self.variation.id)
+        self.assertEqual((self.stock(), self.stock(self.variations[1])), ((10, 8), (10, 0)))
+        self.assertFalse(StockHold.objects.filter(customer=self.other).exists())
+
+        response = self.add(3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['product_variation_id'], self.variation.id)
+        self.assertEqual(Cart.objects.get(customer=self.user).quantity, 8)
+
+        summary = build_cart_summary(self.user.pk)['lines'][0]
+        self.assertEqual((summary['held'], summary['available_stock'], summary['in_stock']), (8, 2, True))
+        Payment.objects.create(customer=self.other, amount=100, razorpay_payment_id='pay_2')
+        self.client.force_authenticate(self.other)
+        response = self.client.post(reverse('create_order'), {
+            'payment_id': 'pay_2', 'product_variation_id': self.variation.id, 'quantity': 3
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_sweep_releases_expired_holds(self):
+        set_holds(self.user.pk, {self.variation.id: 2, self.variations[1].id: 3})
+        set_holds(self.other.pk, {self.variation.id: 4})
+        StockHold.objects.filter(customer=self.user).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(release_expired_holds(chunk_size=1), 2)
+        self.assertEqual((self.stock(), self.stock(self.variations[1])), ((10, 4), (10, 0)))
+        self.assertEqual(release_expired_holds(), 0)
+
+    def test_order_sells_the_customers_own_hold(self):
+        self.add(10)
+        response = self.client.post(reverse('create_order'), {
+            'payment_id': 'pay_1', 'product_variation_id': self.variation.id, 'quantity': 3
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(), (7, 7))
+        self.assertEqual(StockHold.objects.get(customer=self.user).quantity, 7)
+
+    def test_cart_changes_queue_the_expiry_sweep(self):
+        caches['default'].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(2)
+            self.add(1, self.variations[1])
+        sweep = Job.objects.get(name='ecom_app.holds.release_expired_holds')
+        self.assertGreaterEqual(sweep.run_after, StockHold.objects.latest('expires_at').expires_at)
+
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        Job.objects.update(run_after=timezone.now())
+        call_command('run_workers', burst=True, stdout=io.StringIO())
+        self.assertEqual((self.stock(), self.stock(self.variations[1])), ((10, 0), (10, 0)))
+
+    def test_add_to_cart_needs_a_positive_quantity(self):
+        for quantity in (0, -2, 1.5, '2', True, None):
+            self.assertEqual(self.add(quantity).status_code, 400, quantity)
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual(self.stock(), (10, 0))
+
+        # Quantities below zero drop the hold, they never release more than it holds
+        self.add(2)
+        self.assertIsNone(set_holds(self.user.pk, {self.variation.id: -3, self.variations[1].id: -1}))
+        self.assertEqual((self.stock(), self.stock(self.variations[1])), ((10, 0), (10, 0)))
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_admin_save_keeps_concurrent_stock_changes(self):
+        self.client.force_login(Customer.objects.create_superuser(email='admin@example.com', password='secret123'))
+        url = reverse('admin:ecom_app_productvariation_change', args=[self.variation.id])
+        self.assertContains(self.client.get(url), 'name="initial-stock" value="10"')
+
+        # An order and a cart hold land while the form is open
+        ProductVariation.objects.convert_held_stock(self.variation.id, 3, 0)
+        self.add(2)
+        form = {
+            'product': self.variation.product_id, 'color': self.variation.color_id, 'size': self.variation.size_id,
+            'original_price': '90.00', 'discount_price': '80.00', 'initial-stock': 10,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(url, {**form, 'stock': 10}).status_code, 302)
+        self.variation.refresh_from_db()
+        self.assertEqual((self.variation.original_price, self.variation.stock, self.variation.held), (90, 7, 2))
+
+        # Restocking by 5 adds to the current stock
+        self.client.post(url, {**form, 'stock': 15})
+        self.assertEqual(self.stock(), (12, 2))
+
+    def test_checkout_sells_the_holds(self):
+        self.add(4)
+        set_holds(self.other.pk, {self.variation.id: 6})
+        self.assertEqual(self.client.post(reverse('checkout'), {'payment_id': 'pay_1'}, format='json').status_code, 201)
+        self.assertEqual(self.stock(), (6, 6))
+        self.assertFalse(StockHold.objects.filter(customer=self.user).exists())
+
+
+# Concurrent Checkout Tests
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def test_concurrent_orders_never_oversell(self):
+        results = run_checkout_stress(threads=4, attempts=10, stock=15)
+        self.assertEqual(results['oversold'], 0)
+        self.assertEqual(results['lost_updates'], 0)
+        self.assertEqual(results['errors'], 0)
+        self.assertEqual(results['misreported'], 0)
+        # More attempts than stock, the run has to sell out and reject the rest
+        self.assertEqual((results['placed'], results['rejected'], results['final_stock']), (15, 25, 0))
+
+
+# Order Status Tests
+class OrderStatusTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        payment = Payment.objects.create(customer=self.user, amount=100, razorpay_payment_id='pay_1')
+        variation = self.add_variation(1)
+        Order.objects.bulk_create([
+            Order(customer=self.user, payment=payment, product_variation=variation, quantity=1, order_status='Processing')
+            for _ in range(3)
+        ])
+
+    def test_status_change_is_detected_without_a_select(self):
+        order = Order.objects.first()
+        status_date = order.order_status_date
+        with self.assertNumQueries(1):
+            order.save()
+        self.assertEqual(order.order_status_date, status_date)
+
+        order.order_status = 'Shipped'
+        with self.assertNumQueries(1):
+            order.save(update_fields=['order_status'])
+        order.refresh_from_db()
+        self.assertGreater(order.order_status_date, status_date)
+
+    def test_refresh_takes_the_stored_status(self):
+        order = Order.objects.first()
+        status_date = order.order_status_date
+        Order.objects.filter(pk=order.pk).update(order_status='Shipped')
+        order.refresh_from_db()
+        order.save()
+        order.refresh_from_db()
+        self.assertEqual(order.order_status_date, status_date)
+
+    def test_bulk_status_transition(self):
+        Order.objects.filter(order_id=Order.objects.first().order_id).update(order_status='Shipped')
+        with self.assertNumQueries(1):
+            updated = Order.objects.filter(customer=self.user).transition_status('Shipped')
+        self.assertEqual(updated, 2)
+        self.assertEqual(Order.objects.filter(order_status='Shipped').count(), 3)
+
+
+# Order Admin Tests
+class OrderAdminTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        self.payment = Payment.objects.create(customer=self.user, amount=100, razorpay_payment_id='pay_1')
+        self.variation = self.add_variation(1)
+        self.create_orders(2)
+        self.client.force_login(Customer.objects.create_superuser(email='admin@example.com', password='secret123'))
+
+    def create_orders(self, count):
+        Order.objects.bulk_create([
+            Order(customer=self.user, payment=self.payment, product_variation=self.variation, quantity=1)
+            for _ in range(count)
+        ])
+
+    def test_changelist_queries_do_not_grow_with_orders(self):
+        url = reverse('admin:ecom_app_order_changelist')
+        self.client.get(url)
+        with self.assertNumQueries(4) as few:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.create_orders(20)
+        with self.assertNumQueries(len(few.captured_queries)):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_status_action_updates_selected_orders(self):
+        order_ids = list(Order.objects.values_list('order_id', flat=True))
+        response = self.client.post(reverse('admin:ecom_app_order_changelist'), {
+            'action': 'mark_shipped', '_selected_action': order_ids,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.filter(order_status='Shipped').count(), 2)
+
+    def test_paginator_estimates_only_unfiltered_counts(self):
+        from .admin import EstimatedCountPaginator
+        with mock.patch('ecom_app.admin.estimated_count', return_value=5000000):
+            self.assertEqual(EstimatedCountPaginator(Order.objects.order_by('-pk'), 100).count, 5000000)
+            self.assertEqual(EstimatedCountPaginator(Order.objects.filter(order_status='Shipped').order_by('-pk'), 100).count, 0)
+        self.assertEqual(EstimatedCountPaginator(Order.objects.order_by('-pk'), 100).count, 2)
+
+
+# Cached Token Authentication Tests
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.cache = get_token_cache()
+        self.cache.clear()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123', first_name='Asha')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_token_costs_no_queries(self):
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['first_name'], 'Asha')
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_logout_revokes_the_cached_token(self):
+        self.client.get(reverse('profile'))
+        self.assertEqual(self.client.post(reverse('logout')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+    def test_password_change_and_deactivation_drop_the_cached_user(self):
+        self.client.get(reverse('profile'))
+        response = self.client.put(reverse('password'), {'oldPassword': 'secret123', 'newPassword': 'secret456'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.cache.backend.get(self.token.key))
+
+        self.client.get(reverse('profile'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+    def test_profile_update_does_not_write_back_the_cached_user(self):
+        self.client.get(reverse('profile'))
+        Customer.objects.filter(pk=self.user.pk).update(first_name='Meera')
+        response = self.client.put(reverse('profile'), {'last_name': 'Rao'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.last_name), ('Meera', 'Rao'))
+
+        with override_settings(TOKEN_AUTH_CACHE={'BACKEND': 'ecom_app.authentication.LocMemTokenCache'}):
+            self.assertEqual([error.id for error in check_shared_caches(None)], ['ecom_app.E002'])
+
+    def test_local_memory_cache_is_bounded_and_expires(self):
+        backend = LocMemTokenCache(max_entries=2, timeout=60)
+        for key in ('a', 'b', 'c'):
+            backend.add(key, self.token)
+        self.assertIsNone(backend.get('a'))
+        self.assertEqual(backend.get('c').user.email, 'buyer@example.com')
+
+        with mock.patch('ecom_app.authentication.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(backend.get('c'))
+
+    def test_revoked_token_is_not_cached_again(self):
+        # A request read the token just before a logout deleted it, and stores it after
+        authenticate = CachedTokenAuthentication().authenticate_credentials
+        key = self.token.key
+        read = Token.objects.select_related('user').get(key=key)
+        with mock.patch.object(TokenAuthentication, 'authenticate_credentials', return_value=(self.user, read)):
+            self.token.delete()
+            authenticate(key)
+        self.assertIsNone(self.cache.backend.get(key))
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+        backend = LocMemTokenCache(timeout=60, revoked_timeout=5)
+        backend.revoke('a')
+        backend.add('a', self.token)
+        self.assertIsNone(backend.get('a'))
+        with mock.patch('ecom_app.authentication.time.monotonic', return_value=time.monotonic() + 6):
+            backend.add('a', self.token)
+            self.assertEqual(backend.get('a').user.email, 'buyer@example.com')
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        TOKEN_AUTH_CACHE={'BACKEND': 'ecom_app.authentication.DjangoTokenCache'},
+    )
+    def test_django_cache_backend(self):
+        self.client.get(reverse('profile'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('profile'))
+        self.assertEqual(get_token_cache().stats()['hits'], 1)
+
+
+# Stateless Login Tests
+class StatelessLoginTests(TestCase):
+    def setUp(self):
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+
+    def test_login_only_issues_a_token(self):
+        response = self.client.post(reverse('login'), {'email': 'buyer@example.com', 'password': 'secret123'})
+        self.assertEqual(response.json()['token'], Token.objects.get(user=self.user).key)
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn('sessionid', response.cookies)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+    def test_admin_keeps_sessions(self):
+        admin = Customer.objects.create_superuser(email='admin@example.com', password='secret123')
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get('/admin/').status_code, 200)
+        self.assertTrue(Session.objects.exists())
+
+
+# Async Auth View Tests
+@override_settings(ROOT_URLCONF='ecommerce.asgi_urls')
+class AsyncAuthViewTests(TransactionTestCase):
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+
+    def test_asgi_routes_use_the_async_views(self):
+        self.assertIs(resolve('/login/').func.view_class, AsyncLoginView)
+        self.assertEqual(resolve('/products/').url_name, 'product')
+
+    async def test_login_and_password_change(self):
+        response = await self.async_client.post(
+            '/login/', {'email': 'buyer@example.com', 'password': 'secret123'}, content_type='application/json'
+        )
+        token = response.json()['token']
+        self.assertEqual(token, (await Token.objects.aget(user_id=self.user.id)).key)
+
+        response = await self.async_client.put(
+            '/password/', {'oldPassword': 'secret123', 'newPassword': 'secret456'},
+            content_type='application/json', headers={'Authorization': f'Token {token}'},
+        )
+        self.assertEqual(response.json()['message'], 'Password changed Successfully')
+        response = await self.async_client.post(
+            '/login/', {'email': 'buyer@example.com', 'password': 'secret456'}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['status'], 200)
+        self.assertEqual(get_hashing_pool().stats()['pending'], 0)
+
+    @override_settings(HASHING_POOL={'max_workers': 1, 'max_pending': 0})
+    async def test_saturated_pool_rejects_with_429(self):
+        response = await self.async_client.post(
+            '/login/', {'email': 'buyer@example.com', 'password': 'secret123'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(get_hashing_pool().stats()['rejected'], 1)
+
+
+# Async Catalog View Tests
+class AsyncCatalogViewTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = [self.add_product(index) for index in range(5)]
+
+    async def fetch_both(self, url, **params):
+        sync_response = await sync_to_async(self.client.get)(url, params)
+        get_snapshot_store().clear()
+        with self.settings(ROOT_URLCONF='ecommerce.asgi_urls'):
+            async_response = await self.async_client.get(url, params)
+        get_snapshot_store().clear()
+        return sync_response, async_response
+
+    async def test_async_views_match_sync_output(self):
+        product_id = self.products[0].id
+        for url, params in [
+            ('/products/', {'page_size': 2}),
+            ('/products/', {'page_size': 2, 'color': self.color.id, 'in_stock': 'true'}),
+            ('/category/', {}),
+            ('/heroSlider/', {}),
+            (f'/productdetail/{product_id}/', {'color': self.color.id}),
+        ]:
+            sync_response, async_response = await self.fetch_both(url, **params)
+            self.assertEqual(async_response.status_code, 200)
+            self.assertEqual(async_response.content, sync_response.content, url)
+
+    async def test_async_cursor_walk_and_conditional_get(self):
+        with self.settings(ROOT_URLCONF='ecommerce.asgi_urls'):
+            page = (await self.async_client.get('/products/', {'page_size': 2})).json()
+            ids = [product['id'] for product in page['results']]
+            while page['next']:
+                page = (await self.async_client.get(page['next'])).json()
+                ids += [product['id'] for product in page['results']]
+            self.assertEqual(ids, [product.id for product in self.products])
+
+            page = (await self.async_client.get(page['previous'])).json()
+            self.assertEqual([product['id'] for product in page['results']], ids[2:4])
+
+            response = await self.async_client.get('/category/')
+            response = await self.async_client.get('/category/', headers={'If-None-Match': response.headers['ETag']})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual((await self.async_client.get('/productdetail/999/')).status_code, 404)
+            self.assertEqual((await self.async_client.get('/products/', {'color': 'red'})).status_code, 400)
+
+    async def test_cache_backed_store_runs_off_the_event_loop(self):
+        threads = []
+        for backend, expected_on_loop in [('DjangoCacheSnapshotBackend', False), ('LocMemSnapshotBackend', True)]:
+            with self.settings(CATALOG_SNAPSHOT={'BACKEND': f'ecom_app.snapshots.{backend}'}):
+                await call_store(lambda: threads.append(threading.get_ident()))
+            self.assertEqual(threads.pop() == threading.get_ident(), expected_on_loop, backend)
+
+
+# Replica Router Tests
+class ReplicaRouterTests(CatalogFixtureMixin, TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        get_snapshot_store().clear()
+        caches['default'].clear()
+        self.client = APIClient()
+        self.user = Customer.objects.create_user(email='buyer@example.com', password='secret123')
+        self.client.force_authenticate(self.user)
+
+    def test_catalog_snapshots_render_from_primary(self):
+        # Cached under the newest version, a lagging replica must not fill it
+        Categories.objects.create(category_name='Primary', category_image='category/primary.jpg')
+        Categories.objects.using('replica').create(category_name='Replica', category_image='category/replica.jpg')
+        response = self.client.get(reverse('category'))
+        self.assertEqual([category['category_name'] for category in response.json()], ['Primary'])
+
+        async_response = async_to_sync(AsyncCategoryView.as_view())(APIRequestFactory().get('/async/category/'))
+        self.assertEqual([category['category_name'] for category in json.loads(async_response.content)], ['Primary'])
+
+    def test_validated_catalog_responses_render_from_primary(self):
+        # The ETag names the primary's version, the replica has not seen the product yet
+        self.create_catalog()
+        product = self.add_product(1)
+        response = self.client.get(reverse('product-detail', kwargs={'id': product.id}))
+        self.assertEqual((response.status_code, response.data['product_name']), (200, product.product_name))
+        self.assertIn('ETag', response.headers)
+
+        request = APIRequestFactory().get(f'/async/productdetail/{product.id}/')
+        async_response = async_to_sync(AsyncProductDetailView.as_view())(request, id=product.id)
+        self.assertEqual(json.loads(async_response.content)['product_name'], product.product_name)
+
+        response = self.client.get(reverse('product'), {'stream': 'true'})
+        results = json.loads(b''.join(response.streaming_content))['results']
+        self.assertEqual([row['id'] for row in results], [product.id])
+
+    def test_pin_middleware_stays_async(self):
+        async def get_response(request):
+            return _current_request.get()
+
+        middleware = ReplicaPinMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = APIRequestFactory().get('/')
+        self.assertIs(async_to_sync(middleware)(request), request)
+        self.assertIsNone(_current_request.get())
+
+    def test_writes_pin_the_user_to_primary(self):
+        self.create_catalog()
+        variation = self.add_variation(1)
+        payment = Payment.objects.create(customer=self.user, amount=80, razorpay_payment_id='pay_1')
+        Order.objects.create(customer=self.user, payment=payment, product_variation=variation, quantity=1)
+
+        # The replica has not caught up yet
+        self.assertEqual(self.client.get(reverse('create_order')).data['data'], [])
+
+        self.client.post(reverse('add_to_cart'), {'product_variation_id': variation.id, 'quantity': 1}, format='json')
+        self.assertEqual(len(self.client.get(reverse('create_order')).data['data']), 1)
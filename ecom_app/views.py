@@ -2,12 +2,26 @@ from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
-from django.contrib.auth import authenticate, login
+from django.contrib.auth import authenticate
 from rest_framework.decorators import authentication_classes, permission_classes
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django.contrib.auth.hashers import check_password
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from .authentication import CachedTokenAuthentication, revoke_cached_token
+from .carts import get_cart_summary, invalidate_cart_summary
+from .compiled_serializers import CompiledListMixin, get_compiled_serializer
+from .exports import EXPORT_FORMATS, export_orders, parse_export_filters
+from .holds import convert_holds, set_holds
 from .models import Customer, HeroSlider, Categories, Product, ProductVariation, ShipmentAddress, Cart, Payment, Order
+from .routers import ReplicaReadMixin
+from .signals import stock_changed
+from .snapshots import CatalogSnapshotMixin, ConditionalGetMixin
+from .streaming import StreamingListMixin, streaming_json_response, wants_stream
+from .facets import ProductFacetFilter
+from .search import get_search_backend
+from .pagination import ProductCursorPagination, OrderCursorPagination, ScoreCursorPagination
 from .serializers import UserSerializer, HeroSliderSerializer, CategorySerializer, ProductSerializer, ShipmentAddressSerializer, CartSerializer, PaymentSerializer, OrderSerializer
 
 # Create Register View
@@ -47,7 +61,7 @@ class LoginView(APIView):
 
         user = authenticate(email=email, password=password)
         if user is not None:
-            login(request, user)
+            # Token only, no session row or last_login write
             token, created = Token.objects.get_or_create(user=user)
             return Response({
                 'status': 200,
@@ -64,12 +78,13 @@ class LoginView(APIView):
     
 
 # Create Logout View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 class LogoutView(APIView):
     def post(self, request, *args, **kwargs):
         user = request.user
         Token.objects.filter(user=user).delete()
+        revoke_cached_token(request.auth.key)
         return Response({
             "status": 200,
             "message": "Logout Successful"
@@ -77,7 +92,7 @@ class LogoutView(APIView):
 
 
 # Profile View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 class ProfileView(APIView):
     def get(self, request, *args, **kwargs):
@@ -97,11 +112,14 @@ class ProfileView(APIView):
         return Response(profile)
     
     def put(self, request, *args, **kwargs):
-        user = request.user
+        # The authenticated user can come from the token cache, saving that copy
+        # would write its older values over every other column
+        user = Customer.objects.get(pk=request.user.pk)
         serializer = UserSerializer(user, data=request.data, partial=True)
 
         if serializer.is_valid():
             serializer.save()
+            revoke_cached_token(request.auth.key)
             return Response({
                 "status": 200,
                 "message": "Profile updated successfully"
@@ -113,7 +131,7 @@ class ProfileView(APIView):
     
 
 # Change Password View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 class ChangePasswordView(APIView):
     def put(self, request, *args, **kwargs):
@@ -137,7 +155,9 @@ class ChangePasswordView(APIView):
             })
 
         user.set_password(new_password)
-        user.save()
+        # Only the password, the rest of the cached user may be out of date
+        user.save(update_fields=['password'])
+        revoke_cached_token(request.auth.key)
 
         return Response({
             "status": 200,
@@ -146,26 +166,70 @@ class ChangePasswordView(APIView):
 
 
 # Hero Slider View
-class HeroSliderView(generics.ListAPIView):
+class HeroSliderView(ConditionalGetMixin, CatalogSnapshotMixin, generics.ListAPIView):
+    snapshot_tables = ('heroslider',)
     queryset = HeroSlider.objects.all()
     serializer_class = HeroSliderSerializer
 
 
 # Category View
-class CategoryView(generics.ListAPIView):   
+class CategoryView(ConditionalGetMixin, CatalogSnapshotMixin, generics.ListAPIView):
+    snapshot_tables = ('categories',)
     queryset = Categories.objects.all()
     serializer_class = CategorySerializer
 
 
 # Product View
-class ProductView(generics.ListAPIView):
-    queryset = Product.objects.all()
+class ProductView(ConditionalGetMixin, StreamingListMixin, CatalogSnapshotMixin, CompiledListMixin, generics.ListAPIView):
+    snapshot_tables = ('product', 'productvariation', 'productimage', 'productoffer', 'categories', 'color', 'size', 'productfacet')
+    queryset = Product.objects.for_listing().order_by('id')
     serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination
+
+    def filter_queryset(self, queryset):
+        self.facet_filter = ProductFacetFilter(self.request.query_params)
+        if self.facet_filter.active:
+            queryset = queryset.filter(id__in=self.facet_filter.product_ids())
+        return queryset
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        # Facet counts describe the whole result set, so only the first page carries them
+        if self.paginator.cursor_query_param not in self.request.query_params:
+            response.data['facets'] = self.facet_filter.counts()
+        return response
+
+
+# Product Search View
+class ProductSearchView(APIView):
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({
+                'status': '400',
+                'message': 'Search query is required.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = ScoreCursorPagination()
+        page_size = paginator.get_page_size(request)
+        rows = get_search_backend().search(query, page_size + 1, after=paginator.decode_cursor(request))
+        page = rows[:page_size]
+
+        products = Product.objects.for_listing().in_bulk([product_id for product_id, score in page])
+        results = [products[product_id] for product_id, score in page if product_id in products]
+        serializer = ProductSerializer(results, many=True, context={'request': request})
+        return Response({
+            'status': 200,
+            'message': 'Search results retrieved successfully.',
+            'next': paginator.get_next_link(request, page[-1][1], page[-1][0]) if len(rows) > page_size else None,
+            'data': serializer.data
+        }, status=status.HTTP_200_OK)
 
 
 # Product Detail View
-class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.all()
+class ProductDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+    snapshot_tables = ProductView.snapshot_tables
+    queryset = Product.objects.for_listing()
     serializer_class = ProductSerializer
     lookup_field = 'id'
 
@@ -176,7 +240,7 @@ class ProductDetailView(generics.RetrieveAPIView):
     
 
 # Create Add to Cart View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 class AddToCartView(APIView):
     def post(self, request, *args, **kwargs):
@@ -190,6 +254,12 @@ class AddToCartView(APIView):
                 'message': 'Product variation ID is required.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return Response({
+                'status': '400',
+                'message': 'Quantity must be a positive integer.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         try:
             product_variation = ProductVariation.objects.get(id=product_variation_id)
         except ProductVariation.DoesNotExist:
@@ -198,15 +268,26 @@ class AddToCartView(APIView):
                 'message': 'Product variation not found.'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        cart_item, created = Cart.objects.get_or_create(
-            customer=user,
-            product=product_variation,
-            defaults={'quantity': 0}
-        )
+        with transaction.atomic():
+            cart_item, created = Cart.objects.get_or_create(
+                customer=user,
+                product=product_variation,
+                defaults={'quantity': 0}
+            )
+
+            # Hold stock for the whole line, so checkout can't run out of it
+            if set_holds(user.pk, {product_variation.id: cart_item.quantity + quantity}) is not None:
+                transaction.set_rollback(True)
+                return Response({
+                    'status': '400',
+                    'message': 'Not enough stock available.',
+                    'product_variation_id': product_variation.id
+                }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Update quantity
-        cart_item.quantity += quantity
-        cart_item.save()
+            # Update quantity
+            cart_item.quantity += quantity
+            cart_item.save()
+            transaction.on_commit(lambda: invalidate_cart_summary(user.pk))
 
         return Response({
             'status': 200,
@@ -219,17 +300,29 @@ class AddToCartView(APIView):
 
 
 # Cart View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
-class CarttView(generics.ListAPIView):
+class CarttView(CompiledListMixin, generics.ListAPIView):
     serializer_class = CartSerializer
 
     def get_queryset(self):
         return Cart.objects.filter(customer=self.request.user)
 
 
+# Cart Summary View
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+class CartSummaryView(APIView):
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'status': 200,
+            'message': 'Cart summary retrieved successfully.',
+            'data': get_cart_summary(request.user.pk)
+        }, status=status.HTTP_200_OK)
+
+
 # Update Cart View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 class UpdateCartView(APIView):
     def post(self, request, *args, **kwargs):
@@ -265,15 +358,24 @@ class UpdateCartView(APIView):
                 'message': 'Cart item not found for the given user and product.'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        if quantity <= 0:
-            cart_item.delete()  # If quantity is zero or less, remove the item from the cart
-            return Response({
-                'status': '200',
-                'message': 'Item removed from cart as quantity'
-            }, status=status.HTTP_200_OK)
-
-        cart_item.quantity = quantity
-        cart_item.save()
+        with transaction.atomic():
+            if set_holds(user.pk, {product_variation.id: max(quantity, 0)}) is not None:
+                return Response({
+                    'status': '400',
+                    'message': 'Not enough stock available.',
+                    'product_variation_id': product_variation.id
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            transaction.on_commit(lambda: invalidate_cart_summary(user.pk))
+            if quantity <= 0:
+                cart_item.delete()  # If quantity is zero or less, remove the item from the cart
+                return Response({
+                    'status': '200',
+                    'message': 'Item removed from cart as quantity'
+                }, status=status.HTTP_200_OK)
+
+            cart_item.quantity = quantity
+            cart_item.save()
 
         return Response({
             'status': 200,
@@ -286,7 +388,7 @@ class UpdateCartView(APIView):
     
 
 # Delete Item from Cart View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])  
 class DeleteFromCartView(APIView):
 
@@ -295,7 +397,10 @@ class DeleteFromCartView(APIView):
         try:
             # cart_item = Cart.objects.get(id=item_id, customer=user)
             cart_item = Cart.objects.get(product=item_id, customer=user)
-            cart_item.delete()
+            with transaction.atomic():
+                set_holds(user.pk, {item_id: 0})
+                cart_item.delete()
+                transaction.on_commit(lambda: invalidate_cart_summary(user.pk))
             return Response({
                 "status": 200,
                 "message": "Cart item deleted successfully."
@@ -307,8 +412,118 @@ class DeleteFromCartView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
+# Batch Cart View
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+class BatchCartView(APIView):
+    operations = ('add', 'set', 'remove')
+
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        operations = request.data.get('operations')
+
+        if not isinstance(operations, list) or not operations:
+            return Response({
+                'status': '400',
+                'message': 'A list of operations is required.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        for operation in operations:
+            if not isinstance(operation, dict) or operation.get('op') not in self.operations:
+                return Response({
+                    'status': '400',
+                    'message': 'Each operation needs an op of add, set or remove.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            quantity = operation.get('quantity', 1)
+            if operation['op'] != 'remove' and (not isinstance(quantity, int) or isinstance(quantity, bool)):
+                return Response({
+                    'status': '400',
+                    'message': 'Quantity must be an integer.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        variation_ids = {operation.get('product_variation_id') for operation in operations}
+        variations = ProductVariation.objects.in_bulk([pk for pk in variation_ids if isinstance(pk, int)])
+        missing = [pk for pk in variation_ids if pk not in variations]
+        if missing:
+            return Response({
+                'status': '404',
+                'message': 'Product variation not found.',
+                'product_variation_ids': missing
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # A concurrent request can insert one of the new lines first, which fails the
+        # unique constraint. Running the batch again then sees and updates that line
+        for attempt in range(2):
+            try:
+                error = self.apply_operations(user, operations, variations)
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+        if error is not None:
+            return error
+
+        cart = Cart.objects.filter(customer=user).select_related(
+            'product__product', 'product__color', 'product__size'
+        ).order_by('id')
+        serializer = CartSerializer(cart, many=True)
+        return Response({
+            'status': 200,
+            'message': 'Cart updated successfully.',
+            'data': serializer.data
+        }, status=status.HTTP_200_OK)
+
+    def apply_operations(self, user, operations, variations):
+        # Returns an error response after rolling back, or None once applied
+        with transaction.atomic():
+            cart_items = {}
+            for cart_item in Cart.objects.select_for_update().filter(customer=user, product_id__in=variations):
+                cart_items.setdefault(cart_item.product_id, cart_item)
+
+            # Work out the final quantity of each line before touching the database
+            quantities = {pk: cart_item.quantity for pk, cart_item in cart_items.items()}
+            for operation in operations:
+                pk = operation['product_variation_id']
+                if operation['op'] == 'add':
+                    quantities[pk] = quantities.get(pk, 0) + operation.get('quantity', 1)
+                elif operation['op'] == 'set':
+                    quantities[pk] = operation.get('quantity', 1)
+                else:
+                    quantities[pk] = 0
+
+            unavailable = set_holds(user.pk, {pk: max(quantity, 0) for pk, quantity in quantities.items()})
+            if unavailable is not None:
+                transaction.set_rollback(True)
+                return Response({
+                    'status': '400',
+                    'message': 'Not enough stock available.',
+                    'product_variation_id': unavailable
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            to_create, to_update, to_delete = [], [], []
+            for pk, quantity in quantities.items():
+                cart_item = cart_items.get(pk)
+                if quantity <= 0:
+                    if cart_item:
+                        to_delete.append(cart_item.id)
+                elif cart_item is None:
+                    to_create.append(Cart(customer=user, product=variations[pk], quantity=quantity))
+                elif cart_item.quantity != quantity:
+                    cart_item.quantity = quantity
+                    to_update.append(cart_item)
+
+            if to_delete:
+                Cart.objects.filter(id__in=to_delete).delete()
+            if to_update:
+                Cart.objects.bulk_update(to_update, ['quantity'])
+            if to_create:
+                Cart.objects.bulk_create(to_create)
+            transaction.on_commit(lambda: invalidate_cart_summary(user.pk))
+        return None
+
+
 # Shipment Address View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])  
 class ShipmentAddressView(APIView):
 
@@ -360,7 +575,7 @@ class ShipmentAddressView(APIView):
         
 
 # Payment View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 class PaymentView(APIView):
 
@@ -406,18 +621,38 @@ class PaymentView(APIView):
   
 
 # Order View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
-class CreateOrderView(APIView):
+class CreateOrderView(ReplicaReadMixin, APIView):
 
     def get(self, request, *args, **kwargs):
         user = request.user
-        orders = Order.objects.filter(customer=user)
-        serializer = OrderSerializer(orders, many=True)
+        orders = Order.objects.filter(customer=user).select_related(
+            'payment',
+            'product_variation__product',
+            'product_variation__color',
+            'product_variation__size',
+        )
+        if wants_stream(request):
+            return streaming_json_response({
+                'status': 200,
+                'message': 'Orders retrieved successfully.',
+                'next': None,
+                'previous': None,
+            }, 'data', orders, OrderCursorPagination.ordering, OrderSerializer, replica=self.reads_from_replica)
+
+        paginator = OrderCursorPagination()
+        if settings.API_COMPILED_SERIALIZERS:
+            compiled = get_compiled_serializer(OrderSerializer)
+            data = compiled.serialize(paginator.paginate_queryset(compiled.values(orders), request, view=self))
+        else:
+            data = OrderSerializer(paginator.paginate_queryset(orders, request, view=self), many=True).data
         return Response({
             'status': 200,
             'message': 'Orders retrieved successfully.',
-            'data': serializer.data
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'data': data
         }, status=status.HTTP_200_OK)
 
     def post(self, request, *args, **kwargs):
@@ -446,6 +681,12 @@ class CreateOrderView(APIView):
                 'message': 'Quantity is required.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return Response({
+                'status': '400',
+                'message': 'Quantity must be a positive integer.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         try:
             payment = Payment.objects.get(razorpay_payment_id=payment_id, customer=user)
         except Payment.DoesNotExist:
@@ -462,45 +703,134 @@ class CreateOrderView(APIView):
                 'message': 'Product variation not found.'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        if product_variation.stock < quantity:
-            return Response({
-                'status': '400',
-                'message': 'Not enough stock available.'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            if Order.objects.filter(customer=user, payment=payment, product_variation=product_variation, quantity=quantity).exists():
+                return Response({
+                    'status': '400',
+                    'message': 'Order already exists.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # Sells the customer's own hold first, then available stock
+            if convert_holds(user.pk, {product_variation.id: quantity}) is not None:
+                return Response({
+                    'status': '400',
+                    'message': 'Not enough stock available.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            order = Order.objects.create(
+                customer=user,
+                payment=payment,
+                product_variation=product_variation,
+                quantity=quantity,
+                total_amount=product_variation.effective_price * quantity,
+                order_status='Processing'
+            )
+            stock_changed.send(sender=ProductVariation, variation_ids=[product_variation.id])
+            # The UPDATE changed the row, not the instance read before it. Read in the
+            # transaction, nothing may fail once the order has committed
+            product_variation.refresh_from_db(fields=['stock'])
 
-        order, created = Order.objects.get_or_create(
-            customer=user,
-            payment=payment,
-            product_variation=product_variation,
-            quantity=quantity,
-            defaults={
-                'total_amount': product_variation.discount_price * quantity,
-                'order_status': 'Processing'
-            }
-        )
+        serializer = OrderSerializer(order)
+        return Response({
+            'status': 200,
+            'message': 'Order Placed successfully.',
+            'data': serializer.data
+        }, status=status.HTTP_201_CREATED)
+    
 
-        if not created:
+# Checkout View
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+class CheckoutView(APIView):
+
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        payment_id = request.data.get('payment_id')
+
+        if not payment_id:
             return Response({
                 'status': '400',
-                'message': 'Order already exists.'
+                'message': 'Payment ID is required.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Update stock
-        product_variation.stock -= quantity
-        product_variation.save()
-
-        serializer = OrderSerializer(order)
+        with transaction.atomic():
+            # Locking the payment makes a repeated submit wait for the first one and then
+            # find its orders. Locking the cart lines stops a checkout with another payment
+            # selling them twice, it finds the cart empty instead
+            try:
+                payment = Payment.objects.select_for_update().get(razorpay_payment_id=payment_id, customer=user)
+            except Payment.DoesNotExist:
+                return Response({
+                    'status': '404',
+                    'message': 'Payment not found.'
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            if Order.objects.filter(customer=user, payment=payment).exists():
+                return Response({
+                    'status': '400',
+                    'message': 'Order already exists.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            cart_items = list(
+                Cart.objects.select_for_update(of=('self',)).filter(customer=user, product__isnull=False)
+                .select_related('product')
+            )
+            if not cart_items:
+                return Response({
+                    'status': '400',
+                    'message': 'Cart is empty.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            quantities = {}
+            for cart_item in cart_items:
+                quantities[cart_item.product_id] = quantities.get(cart_item.product_id, 0) + cart_item.quantity
+
+            # Sells the cart's holds, and available stock for any part not held.
+            # Variations go in id order so concurrent checkouts lock rows in the same order
+            unavailable = convert_holds(user.pk, quantities)
+            if unavailable is not None:
+                return Response({
+                    'status': '400',
+                    'message': 'Not enough stock available.',
+                    'product_variation_id': unavailable
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            Order.objects.bulk_create([
+                Order(
+                    customer=user,
+                    payment=payment,
+                    product_variation=cart_item.product,
+                    quantity=cart_item.quantity,
+                    total_amount=cart_item.product.effective_price * cart_item.quantity,
+                    order_status='Processing'
+                )
+                for cart_item in cart_items
+            ])
+            Cart.objects.filter(customer=user).delete()
+            stock_changed.send(sender=ProductVariation, variation_ids=list(quantities))
+            # The cart is already gone, a cache error must not turn the checkout into a 500
+            transaction.on_commit(lambda: invalidate_cart_summary(user.pk), robust=True)
+
+            # Read the orders back, MySQL does not return primary keys from bulk_create.
+            # Still in the transaction, nothing may fail once the checkout has committed
+            orders = list(Order.objects.filter(customer=user, payment=payment).select_related(
+                'payment',
+                'product_variation__product',
+                'product_variation__color',
+                'product_variation__size',
+            ).order_by('order_id'))
+        serializer = OrderSerializer(orders, many=True)
         return Response({
             'status': 200,
             'message': 'Order Placed successfully.',
             'data': serializer.data
         }, status=status.HTTP_201_CREATED)
-    
+
 
 # Get Order Detail View
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
-class GetOrderDetailView(APIView):
+class GetOrderDetailView(ReplicaReadMixin, APIView):
     def get(self, request, order_id, *args, **kwargs):
         user = request.user
         try:
@@ -516,4 +846,34 @@ class GetOrderDetailView(APIView):
             return Response({
                 'status': 404,
                 'message': 'Order not found.'
-            }, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            }, status=status.HTTP_404_NOT_FOUND)
+
+
+# Order Export View
+# Staff only. Resume an interrupted download with after_order_id set to the last order_id received
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAdminUser])
+class OrderExportView(APIView):
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        export_format = params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response({
+                'status': 400,
+                'message': f'output must be one of {", ".join(sorted(EXPORT_FORMATS))}.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            filters = parse_export_filters(params.get('start'), params.get('end'), params.get('after_order_id'))
+        except ValueError as e:
+            return Response({
+                'status': 400,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        output = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            (text for text, rows, last_order_id in export_orders(export_format, **filters)),
+            content_type=output.content_type,
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename="orders.{output.extension}"'
+        return response
@@ -0,0 +1,15 @@
+from django.urls import path
+from ecom_app.async_views import AsyncRegisterView, AsyncLoginView, AsyncChangePasswordView, AsyncHeroSliderView, AsyncCategoryView, AsyncProductView, AsyncProductDetailView
+from .urls import urlpatterns as sync_urlpatterns
+
+# Served by the ASGI entry point only. Async views come first and take over
+# their routes, everything else falls through to the sync urlpatterns.
+urlpatterns = [
+    path('register/', AsyncRegisterView.as_view(), name='register'),
+    path('login/', AsyncLoginView.as_view(), name='login'),
+    path('password/', AsyncChangePasswordView.as_view(), name='password'),
+    path('heroSlider/', AsyncHeroSliderView.as_view(), name='hero_slider'),
+    path('category/', AsyncCategoryView.as_view(), name='category'),
+    path('products/', AsyncProductView.as_view(), name='product'),
+    path('productdetail/<int:id>/', AsyncProductDetailView.as_view(), name='product-detail'),
+] + sync_urlpatterns
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,19 +49,118 @@ AUTH_USER_MODEL = 'ecom_app.Customer'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'ecom_app.authentication.CachedTokenAuthentication',
     ]
 }
 
+# Caches shared by all worker processes on this host. State that one worker
+# invalidates must be seen by the others, so never use LocMemCache here
+# (manage.py check refuses it). Across several hosts use Redis or Memcached,
+# e.g. 'django.core.cache.backends.redis.RedisCache' with a redis:// LOCATION.
+CACHE_DIR = os.environ.get('DJANGO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'ecommerce-cache'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'default'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'catalog'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Cursor pagination for list endpoints
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Serialize product, cart and order lists from values() rows instead of model
+# instances, see ecom_app/compiled_serializers.py. Output is identical.
+API_COMPILED_SERIALIZERS = True
+
+# Rows per query for ?stream=true list responses
+API_STREAM_CHUNK_SIZE = 500
+
+# Rows per query for the order export (export_orders command and /export/orders/)
+EXPORT_CHUNK_SIZE = 2000
+
+# Token -> user lookups for CachedTokenAuthentication, in a cache every worker
+# shares so logout and revocations reach all of them at once. LocMemTokenCache
+# only suits a single process.
+TOKEN_AUTH_CACHE = {
+    'BACKEND': 'ecom_app.authentication.DjangoTokenCache',
+    'OPTIONS': {
+        'alias': 'default',
+        'timeout': 300,
+        # How long a revoked token is kept from being cached again
+        'revoked_timeout': 30,
+    },
+}
+
+# Thread pool for password hashing in the async auth views (ASGI only).
+# Requests beyond max_pending queued hashes get a 429.
+HASHING_POOL = {
+    'max_workers': 4,
+    'max_pending': 32,
+}
+
+# Cached cart totals for /cart/summary/, see ecom_app/carts.py.
+# Must be a cache shared between workers (ecom_app.E003), cart changes invalidate it per user.
+CART_SUMMARY = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# Cart stock holds, see ecom_app/holds.py. A hold lasts SECONDS after the cart
+# last changed. Cart changes queue a sweep on the job queue (manage.py run_workers)
+# that frees expired holds, at most one per SWEEP_INTERVAL seconds.
+# manage.py release_expired_holds sweeps by hand.
+STOCK_HOLDS = {
+    'SECONDS': 900,
+    'SWEEP_INTERVAL': 60,
+    'SWEEP_CHUNK_SIZE': 500,
+}
+
+# Database job queue, see ecom_app/jobs.py and manage.py run_workers.
+# Failed jobs are retried MAX_ATTEMPTS times, BACKOFF_SECONDS * 2 ** (attempt - 1) apart
+# up to MAX_BACKOFF_SECONDS. Jobs claimed longer than CLAIM_TIMEOUT ago are handed out again.
+# A worker claims BATCH_SIZE jobs at a time, raise it when most jobs take milliseconds.
+JOB_QUEUE = {
+    'BATCH_SIZE': 1,
+    'POLL_SECONDS': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 10,
+    'MAX_BACKOFF_SECONDS': 3600,
+    'CLAIM_TIMEOUT': 600,
+}
+
+# Pre-rendered catalog responses, kept in the 'catalog' cache so every worker sees
+# the same table versions. Snapshots expire after timeout seconds even if an
+# invalidation is lost. LocMemSnapshotBackend only suits a single process.
+CATALOG_SNAPSHOT = {
+    'BACKEND': 'ecom_app.snapshots.DjangoCacheSnapshotBackend',
+    'OPTIONS': {
+        'alias': 'catalog',
+        'timeout': 3600,
+    },
+}
+
+# Session, CSRF, auth and message middleware only run for these paths,
+# the token-authenticated API stays stateless
+STATEFUL_PATH_PREFIXES = ['/admin/']
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'ecom_app.middleware.ApiSessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'ecom_app.middleware.ApiCsrfViewMiddleware',
+    'ecom_app.middleware.ApiAuthenticationMiddleware',
+    'ecom_app.middleware.ApiMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ecom_app.middleware.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'ecommerce.urls'
@@ -91,7 +191,24 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Stands in for a read replica locally, tests get a separate database for it
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+}
+
+DATABASE_ROUTERS = ['ecom_app.routers.ReplicaRouter']
+
+# Catalog and order history reads go to one of ALIASES. A write to one of
+# PIN_MODELS pins that user's reads to the primary for PIN_SECONDS. Use a
+# shared cache for PIN_CACHE when running more than one worker.
+DATABASE_REPLICAS = {
+    'ALIASES': ['replica'],
+    'PIN_MODELS': ['ecom_app.Cart', 'ecom_app.Order', 'ecom_app.Payment'],
+    'PIN_SECONDS': 5,
+    'PIN_CACHE': 'default',
 }
 # DATABASES = {
 #     'default': {
@@ -148,6 +265,26 @@ STATIC_URL = '/static/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# How MEDIA_URL is served:
+#   'sendfile'          Django sends the file, with Range and If-Modified-Since support
+#   'x-accel-redirect'  nginx sends it from an internal location at ACCEL_PREFIX
+#   'x-sendfile'        Apache (mod_xsendfile) or lighttpd sends it from MEDIA_ROOT
+#   None                no media URL in Django, the front proxy serves MEDIA_ROOT itself
+# Image derivatives have content hashed names and are cached as immutable.
+MEDIA_SERVING = {
+    'MODE': 'sendfile',
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+}
+
+# Resized copies of uploaded images, each as WebP and JPEG (PNG with transparency),
+# under content addressed names in MEDIA_ROOT/PATH. See ecom_app/images.py.
+IMAGE_DERIVATIVES = {
+    'WIDTHS': [320, 640, 1024, 1600],
+    'QUALITY': 80,
+    'PATH': 'derivatives',
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -1,8 +1,8 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
-from ecom_app.views import RegisterView,LoginView,LogoutView,ProfileView,ChangePasswordView,HeroSliderView,CategoryView,ProductView,ProductDetailView,ShipmentAddressView,AddToCartView,CarttView,DeleteFromCartView,UpdateCartView,PaymentView,CreateOrderView,GetOrderDetailView
+from ecom_app.media import serve_media
+from ecom_app.views import RegisterView,LoginView,LogoutView,ProfileView,ChangePasswordView,HeroSliderView,CategoryView,ProductView,ProductSearchView,ProductDetailView,ShipmentAddressView,AddToCartView,CarttView,CartSummaryView,DeleteFromCartView,UpdateCartView,BatchCartView,PaymentView,CreateOrderView,CheckoutView,GetOrderDetailView,OrderExportView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,13 +14,23 @@ urlpatterns = [
     path('heroSlider/', HeroSliderView.as_view(), name='hero_slider'),
     path('category/', CategoryView.as_view(), name='category'),
     path('products/', ProductView.as_view(), name='product'),
+    path('products/search/', ProductSearchView.as_view(), name='product-search'),
     path('productdetail/<int:id>/', ProductDetailView.as_view(), name='product-detail'),
     path('add-to-cart/', AddToCartView.as_view(), name='add_to_cart'),
     path('cart/', CarttView.as_view(), name='cart'),
+    path('cart/summary/', CartSummaryView.as_view(), name='cart_summary'),
     path('cart/update/', UpdateCartView.as_view(), name='update_cart'),
     path('cart/delete/<int:item_id>/', DeleteFromCartView.as_view(), name='delete-cart-item'),
+    path('cart/batch/', BatchCartView.as_view(), name='batch_cart'),
     path('shipment-address/', ShipmentAddressView.as_view(), name='shipment-address'),
     path('payment/', PaymentView.as_view(), name='payment'),
     path('order/', CreateOrderView.as_view(), name='create_order'),
+    path('checkout/', CheckoutView.as_view(), name='checkout'),
     path('order/<int:order_id>/', GetOrderDetailView.as_view(), name='get_order_detail'),
-]+static(settings.MEDIA_URL,document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path('export/orders/', OrderExportView.as_view(), name='order_export'),
+]
+
+# Media from Django, or checked by Django and sent by the front proxy, see MEDIA_SERVING.
+# With no mode the front proxy serves MEDIA_URL on its own.
+if settings.MEDIA_SERVING['MODE']:
+    urlpatterns.append(path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'))
\ No newline at end of file